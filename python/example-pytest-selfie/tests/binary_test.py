@@ -40,9 +40,7 @@ def test_binary_file_duplicate_unequal():
         expect_selfie(b"b").to_be_file(
             "tests/binary_test__test_binary_file_duplicate_unequal.bin"
         )
-    expect_selfie(safify(str(exc_info.value))).to_be(
-        "Snapshot mismatch (error msg could be better https://github.com/diffplug/selfie/issues/501)"
-    )
+    expect_selfie(safify(str(exc_info.value))).to_be("Snapshot mismatch")
 
 
 def test_binary_file_mismatch():
@@ -64,9 +62,7 @@ def test_base64_mismatch():
     """Test error handling for mismatched base64 data"""
     with pytest.raises(Exception) as exc_info:
         expect_selfie(b"test data").to_be_base64("AAAA")
-    expect_selfie(safify(str(exc_info.value))).to_be(
-        "Snapshot mismatch (error msg could be better https://github.com/diffplug/selfie/issues/501)"
-    )
+    expect_selfie(safify(str(exc_info.value))).to_be("Snapshot mismatch")
 
 
 def safify(string: str) -> str:
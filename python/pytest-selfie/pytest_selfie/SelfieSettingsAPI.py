@@ -1,9 +1,11 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import pytest
-from selfie_lib import Mode
+
+if TYPE_CHECKING:
+    from selfie_lib import Mode
 
 
 class SelfieSettingsAPI:
@@ -11,6 +13,7 @@ class SelfieSettingsAPI:
 
     def __init__(self, config: pytest.Config):
         self.root_dir = config.rootpath
+        self.config = config
 
     @property
     def allow_multiple_equivalent_writes_to_one_location(self) -> bool:
@@ -27,7 +30,29 @@ class SelfieSettingsAPI:
         """Returns the root folder for storing snapshots. Set by https://docs.pytest.org/en/7.1.x/reference/customize.html#finding-the-rootdir"""
         return self.root_dir
 
-    def calc_mode(self) -> Mode:
+    @property
+    def line_ending_probe_max_files(self) -> int:
+        """Maximum number of files to read when inferring the line ending of new snapshot files."""
+        return int(self.config.getini("selfie_line_ending_probe_max_files"))
+
+    @property
+    def line_ending_probe_max_bytes(self) -> int:
+        """Maximum number of bytes to read when inferring the line ending of new snapshot files."""
+        return int(self.config.getini("selfie_line_ending_probe_max_bytes"))
+
+    @property
+    def prefetch_snapshot_files(self) -> bool:
+        """Read and parse the snapshot files of every collected test file on a thread pool, before the tests need them."""
+        return bool(self.config.getini("selfie_prefetch_snapshot_files"))
+
+    @property
+    def cache(self) -> Optional[pytest.Cache]:
+        """The pytest cache, or None if the cacheprovider plugin is disabled."""
+        return getattr(self.config, "cache", None)
+
+    def calc_mode(self) -> "Mode":
+        from selfie_lib import Mode
+
         override = os.getenv("selfie") or os.getenv("SELFIE")  # noqa: SIM112
         if override:
             # Convert the mode to lowercase and match it with the Mode enum
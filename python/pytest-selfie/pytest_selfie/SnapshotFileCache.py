@@ -0,0 +1,130 @@
+import contextlib
+import hashlib
+import marshal
+import mmap
+import os
+from pathlib import Path
+from threading import get_ident
+from typing import Optional, Union
+
+from selfie_lib import SnapshotFile
+from selfie_lib.SnapshotFileScanner import SnapshotEntry, SnapshotFileScanner
+
+from .SelfieSettingsAPI import SelfieSettingsAPI
+
+
+class SnapshotFileCache:
+    """
+    Remembers where the entries of each snapshot file are, so that an unchanged file doesn't have to be scanned again on the next run.
+
+    Every snapshot file gets one small file in `.pytest_cache/d/selfie-parsed`, keyed by its path, size and
+    mtime, and checked against a checksum of just the header lines and boundaries of its entries, which are
+    all that the entries depend on. Only when the size or mtime changed is the whole content hashed, so that
+    a file which was touched but not changed (e.g. by a checkout) isn't scanned again either. Entries which
+    are stale or can't be read are ignored, and the file is scanned as usual.
+    """
+
+    # bump whenever the format of the cached entries changes
+    VERSION = 3
+    FOLDER_NAME = "selfie-parsed"
+
+    def __init__(self, folder: Optional[Path]):
+        self.folder = folder
+
+    @classmethod
+    def of(cls, settings: SelfieSettingsAPI) -> "SnapshotFileCache":
+        cache = settings.cache
+        return cls(cache.mkdir(cls.FOLDER_NAME) if cache is not None else None)
+
+    def map_file(self, path: str, in_memory: bool = False) -> SnapshotFile:
+        """Same as `SnapshotFile.map_file`, but with the entries from the cache if the file is unchanged."""
+        if self.folder is None:
+            return SnapshotFile.map_file(path, in_memory)
+        stat = os.stat(path)
+        identity = (path, stat.st_size, stat.st_mtime_ns)
+        cache_file = self.folder / hashlib.blake2b(path.encode()).hexdigest()[:32]
+
+        def scan(content: Union[bytes, mmap.mmap]) -> list[SnapshotEntry]:
+            cached = _load(cache_file)
+            if cached is not None:
+                cached_identity, cached_digest, cached_headers, entries = cached
+                # the same size and mtime can still hide a write within one mtime tick
+                if cached_identity == identity and cached_headers == _headers(
+                    content, entries
+                ):
+                    return entries
+                digest = _digest(content)
+                if cached_digest == digest:
+                    _store(cache_file, identity, digest, cached_headers, entries)
+                    return entries
+            else:
+                digest = _digest(content)
+            entries = list(SnapshotFileScanner(content).entries())
+            _store(cache_file, identity, digest, _headers(content, entries), entries)
+            return entries
+
+        return SnapshotFile.map_file(path, in_memory, scan)
+
+
+def _digest(content: Union[bytes, mmap.mmap]) -> bytes:
+    return hashlib.blake2b(content).digest()
+
+
+def _headers(content: Union[bytes, mmap.mmap], entries: list[SnapshotEntry]) -> bytes:
+    """A checksum of the bytes which the entries were parsed from, other than their values."""
+    digest = hashlib.blake2b()
+    for entry in entries:
+        digest.update(content[entry.header_start : entry.value_start])
+        # the newline which ends the value, or nothing at the end of the file
+        digest.update(content[entry.value_end : entry.value_end + 1])
+    # the `[end of file]` marker, or the whole content if there are no entries
+    digest.update(content[entries[-1].value_end if entries else 0 :])
+    return digest.digest()
+
+
+def _load(
+    cache_file: Path,
+) -> Optional[tuple[tuple[str, int, int], bytes, bytes, list[SnapshotEntry]]]:
+    try:
+        # `marshal.load` reads a file in small pieces, which is far slower than reading it whole
+        version, identity, digest, headers, entries = marshal.loads(
+            cache_file.read_bytes()
+        )
+        if version != SnapshotFileCache.VERSION:
+            return None
+        return (
+            tuple(identity),
+            digest,
+            headers,
+            [SnapshotEntry(*entry) for entry in entries],
+        )
+    except Exception:  # noqa: BLE001
+        # missing, stale or corrupt, which all mean the file has to be scanned again
+        return None
+
+
+def _store(
+    cache_file: Path,
+    identity: tuple[str, int, int],
+    digest: bytes,
+    headers: bytes,
+    entries: list[SnapshotEntry],
+) -> None:
+    content = marshal.dumps(
+        (
+            SnapshotFileCache.VERSION,
+            identity,
+            digest,
+            headers,
+            [tuple(e) for e in entries],
+        )
+    )
+    # other processes (e.g. pytest-xdist workers) might be storing the same entry
+    temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}-{get_ident()}")
+    try:
+        temp_file.write_bytes(content)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # the cache is only an optimization
+        with contextlib.suppress(OSError):
+            temp_file.unlink()
@@ -1,2 +1,15 @@
-from .plugin import FSImplementation as FSImplementation
+from typing import TYPE_CHECKING
+
 from .SelfieSettingsAPI import SelfieSettingsAPI as SelfieSettingsAPI
+
+if TYPE_CHECKING:
+    from .PytestSnapshotSystem import FSImplementation as FSImplementation
+
+
+def __getattr__(name: str):
+    # lazy, so that loading the pytest plugin doesn't load the snapshot system
+    if name == "FSImplementation":
+        from .PytestSnapshotSystem import FSImplementation
+
+        return FSImplementation
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
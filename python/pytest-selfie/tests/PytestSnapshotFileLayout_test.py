@@ -0,0 +1,46 @@
+from selfie_lib import TypedPath
+
+from pytest_selfie.PytestSnapshotSystem import _probe_line_ending_is_unix
+
+
+def probe(tmp_path, max_files=200, max_bytes=4 * 1024 * 1024) -> bool:
+    return _probe_line_ending_is_unix(
+        TypedPath.of_folder(str(tmp_path)), max_files, max_bytes
+    )
+
+
+def test_empty_folder_assumes_unix(tmp_path):
+    assert probe(tmp_path)
+
+
+def test_finds_windows_newlines(tmp_path):
+    (tmp_path / "a.py").write_bytes(b"one\r\ntwo\r\n")
+    assert not probe(tmp_path)
+    (tmp_path / "a.py").write_bytes(b"one\ntwo\n")
+    assert probe(tmp_path)
+
+
+def test_skips_binary_and_newline_free_files(tmp_path):
+    (tmp_path / "a.bin").write_bytes(b"\xff\xfe\r\n")
+    (tmp_path / "b.txt").write_bytes(b"no newline")
+    (tmp_path / "c.py").write_bytes(b"one\r\n")
+    assert not probe(tmp_path)
+
+
+def test_skips_vcs_venv_and_build_folders(tmp_path):
+    for folder in [".git", "node_modules", "build", "custom-env"]:
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "a.txt").write_bytes(b"one\r\n")
+    (tmp_path / "custom-env" / "pyvenv.cfg").write_bytes(b"home = /usr\r\n")
+    assert probe(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_bytes(b"one\r\n")
+    assert not probe(tmp_path)
+
+
+def test_stops_when_budget_is_exhausted(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"no newline")
+    (tmp_path / "b.py").write_bytes(b"one\r\n")
+    assert not probe(tmp_path)
+    assert probe(tmp_path, max_files=1)
+    assert probe(tmp_path, max_bytes=len(b"no newline"))
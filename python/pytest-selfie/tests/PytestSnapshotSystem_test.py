@@ -0,0 +1,105 @@
+import os
+import sys
+
+import pytest
+
+pytest_plugins = ["pytester"]
+
+TEST_DISK = """
+from selfie_lib import expect_selfie
+
+def test_disk():
+    expect_selfie("{value}").to_match_disk()
+"""
+
+CONFTEST_RECORDING_WRITER_THREAD = """
+import threading
+
+from selfie_lib import SnapshotFile
+
+write_file = SnapshotFile.write_file
+
+def recording_write_file(self, path):
+    with open("threads.txt", "a") as threads:
+        threads.write(threading.current_thread().name + "\\n")
+    return write_file(self, path)
+
+SnapshotFile.write_file = recording_write_file
+"""
+
+
+@pytest.fixture
+def run_selfie(pytester: pytest.Pytester, monkeypatch, request):
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(sys.path))
+    monkeypatch.setenv("SELFIE", "overwrite")
+    plugin_args = []
+    if not request.config.pluginmanager.hasplugin("pytest_selfie"):
+        plugin_args = ["-p", "pytest_selfie.plugin"]
+    return lambda: pytester.runpytest_subprocess(*plugin_args)
+
+
+def test_snapshot_files_are_written_in_background(pytester, run_selfie):
+    pytester.makeconftest(CONFTEST_RECORDING_WRITER_THREAD)
+    pytester.makepyfile(
+        first_test=TEST_DISK.format(value="first"),
+        second_test=TEST_DISK.format(value="second"),
+    )
+    result = run_selfie()
+    result.assert_outcomes(passed=2)
+    assert "first" in (pytester.path / "first_test.ss").read_text()
+    assert "second" in (pytester.path / "second_test.ss").read_text()
+    threads = (pytester.path / "threads.txt").read_text().split()
+    assert len(threads) == 2
+    assert all(thread.startswith("selfie-disk-writer") for thread in threads)
+
+
+def test_failed_writes_are_reported_at_session_finish(pytester, run_selfie):
+    pytester.makepyfile(
+        first_test=TEST_DISK.format(value="first"),
+        second_test=TEST_DISK.format(value="second"),
+    )
+    # a folder can't be replaced by a snapshot file
+    (pytester.path / "first_test.ss").mkdir()
+    result = run_selfie()
+    result.assert_outcomes(passed=2)
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+    result.stdout.fnmatch_lines(["*= selfie =*", "Failed to write *first_test.ss: *"])
+    # the other snapshot files are still written
+    assert "second" in (pytester.path / "second_test.ss").read_text()
+
+
+TEST_READS_DISK = """
+from selfie_lib import expect_selfie
+
+def test_read():
+    expect_selfie("apple").to_match_disk()
+"""
+
+SNAPSHOT_FILE = """╔═ test_read ═╗
+apple
+╔═ [end of file] ═╗
+"""
+
+
+def test_prefetched_snapshot_files_are_used(pytester, run_selfie, monkeypatch):
+    monkeypatch.setenv("SELFIE", "readonly")
+    pytester.makeini("[pytest]\nselfie_prefetch_snapshot_files = true")
+    pytester.makepyfile(read_test=TEST_READS_DISK)
+    (pytester.path / "read_test.ss").write_text(SNAPSHOT_FILE)
+    run_selfie().assert_outcomes(passed=1)
+
+
+def test_prefetch_fails_fast_in_readonly(pytester, run_selfie, monkeypatch):
+    monkeypatch.setenv("SELFIE", "readonly")
+    pytester.makeini("[pytest]\nselfie_prefetch_snapshot_files = true")
+    pytester.makepyfile(read_test=TEST_READS_DISK, other_test=TEST_READS_DISK)
+    (pytester.path / "read_test.ss").write_text(SNAPSHOT_FILE)
+    (pytester.path / "other_test.ss").write_text(
+        "╔═ test_read ═╗ base64 length 3 bytes\nnot base64!\n"
+    )
+    result = run_selfie()
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+    result.stdout.fnmatch_lines(
+        ["*Snapshot files can't be parsed:", "- *other_test.ss: *"]
+    )
+    result.stdout.no_fnmatch_line("*passed*")
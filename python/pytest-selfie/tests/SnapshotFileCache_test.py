@@ -0,0 +1,151 @@
+import os
+
+import pytest
+from selfie_lib import Snapshot
+from selfie_lib.SnapshotFileScanner import SnapshotFileScanner
+
+from pytest_selfie import SnapshotFileCache as cache_module
+from pytest_selfie.SnapshotFileCache import SnapshotFileCache
+
+CONTENT = """╔═ Apple ═╗
+Granny Smith
+╔═ Apple[color] ═╗
+green
+╔═ Orange ═╗
+Orange
+╔═ [end of file] ═╗
+"""
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Counts how many times a snapshot file was actually scanned."""
+    count = [0]
+    entries = SnapshotFileScanner.entries
+
+    def counting_entries(self):
+        count[0] += 1
+        return entries(self)
+
+    monkeypatch.setattr(SnapshotFileScanner, "entries", counting_entries)
+    return count
+
+
+@pytest.fixture
+def digests(monkeypatch):
+    """Counts how many times the content of a snapshot file was hashed."""
+    count = [0]
+    digest = cache_module._digest  # noqa: SLF001
+
+    def counting_digest(content):
+        count[0] += 1
+        return digest(content)
+
+    monkeypatch.setattr(cache_module, "_digest", counting_digest)
+    return count
+
+
+def map_snapshots(cache: SnapshotFileCache, path) -> dict[str, Snapshot]:
+    file = cache.map_file(str(path))
+    snapshots = dict(file.snapshots.items())
+    file.close()
+    return snapshots
+
+
+def test_unchanged_file_isnt_scanned_or_hashed_again(tmp_path, scans, digests):
+    cache = SnapshotFileCache(tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    path = tmp_path / "test.ss"
+    path.write_text(CONTENT)
+
+    expected = {
+        "Apple": Snapshot.of("Granny Smith").plus_facet("color", "green"),
+        "Orange": Snapshot.of("Orange"),
+    }
+    assert map_snapshots(cache, path) == expected
+    assert (scans[0], digests[0]) == (1, 1)
+    assert map_snapshots(cache, path) == expected
+    assert (scans[0], digests[0]) == (1, 1)
+
+    path.write_text(CONTENT.replace("Orange\n", "Blood Orange\n"))
+    assert map_snapshots(cache, path)["Orange"] == Snapshot.of("Blood Orange")
+    assert scans[0] == 2
+
+
+def test_touched_file_is_hashed_but_not_scanned(tmp_path, scans, digests):
+    cache = SnapshotFileCache(tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    path = tmp_path / "test.ss"
+    path.write_text(CONTENT)
+    expected = map_snapshots(cache, path)
+    stat = path.stat()
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert map_snapshots(cache, path) == expected
+    assert (scans[0], digests[0]) == (1, 2)
+    # and the cache now has the new mtime
+    assert map_snapshots(cache, path) == expected
+    assert (scans[0], digests[0]) == (1, 2)
+
+    path.write_text(CONTENT.replace("Orange\n", "Lemons\n"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+    assert map_snapshots(cache, path)["Orange"] == Snapshot.of("Lemons")
+    assert (scans[0], digests[0]) == (2, 3)
+
+
+def test_write_within_one_mtime_tick(tmp_path, scans, digests):
+    cache = SnapshotFileCache(tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    path = tmp_path / "test.ss"
+    path.write_text(CONTENT)
+    map_snapshots(cache, path)
+    stat = path.stat()
+
+    def rewrite(content: str):
+        path.write_text(content)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert path.stat().st_size == stat.st_size
+
+    # a value is read from the file itself, so its entry is still right
+    rewrite(CONTENT.replace("Orange\n", "Lemons\n"))
+    assert map_snapshots(cache, path)["Orange"] == Snapshot.of("Lemons")
+    assert (scans[0], digests[0]) == (1, 1)
+
+    # but a changed key or boundary is noticed, and the file is scanned again
+    rewrite(CONTENT.replace("Orange", "Lemons"))
+    assert map_snapshots(cache, path)["Lemons"] == Snapshot.of("Lemons")
+    assert (scans[0], digests[0]) == (2, 2)
+    rewrite(CONTENT)
+    map_snapshots(cache, path)
+    assert scans[0] == 3
+    rewrite(CONTENT.replace("Smith\n", "Smit\n").replace("green\n", "greens\n"))
+    assert map_snapshots(cache, path)["Apple"] == Snapshot.of("Granny Smit").plus_facet(
+        "color", "greens"
+    )
+    assert scans[0] == 4
+
+
+def test_corrupt_cache_falls_back_to_scanning(tmp_path, scans):
+    cache = SnapshotFileCache(tmp_path / "cache")
+    (tmp_path / "cache").mkdir()
+    path = tmp_path / "test.ss"
+    path.write_text(CONTENT)
+    expected = map_snapshots(cache, path)
+
+    (cache_file,) = (tmp_path / "cache").iterdir()
+    for corrupt in [b"", b"not marshal", cache_file.read_bytes()[:-7]]:
+        cache_file.write_bytes(corrupt)
+        assert map_snapshots(cache, path) == expected
+    assert scans[0] == 4
+    # and the cache is repaired
+    assert map_snapshots(cache, path) == expected
+    assert scans[0] == 4
+
+
+def test_without_a_cache_folder(tmp_path, scans):
+    path = tmp_path / "test.ss"
+    path.write_text(CONTENT)
+    cache = SnapshotFileCache(None)
+    map_snapshots(cache, path)
+    map_snapshots(cache, path)
+    assert scans[0] == 2
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+
+def test_plugin_import_is_cheap():
+    # the plugin is loaded on every pytest run, it should only load the snapshot system once tests are collected
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import pytest_selfie.plugin"],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    selfie_modules = sorted(
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "selfie_lib" in line.split("|")[-1]
+    )
+    assert selfie_modules == ["selfie_lib", "selfie_lib.TypedPath"]
@@ -1,6 +1,10 @@
+import contextlib
 from abc import ABC, abstractmethod
-from collections.abc import ItemsView, Iterator, Mapping, Set
-from typing import Any, TypeVar, Union
+from bisect import bisect_left
+from collections.abc import ItemsView, Iterable, Iterator, Mapping, Set
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Generic, NamedTuple, Optional, TypeVar, Union
 
 T = TypeVar("T")
 V = TypeVar("V")
@@ -20,6 +24,19 @@ def _compare_string_slash_first(a: str, b: str) -> int:
     return _compare_normal(a.replace("/", "\0"), b.replace("/", "\0"))
 
 
+def _sort_key(item):
+    # same order as _compare_string_slash_first
+    return item.replace("/", "\0") if isinstance(item, str) else item
+
+
+def _prefix_end(prefix_sort_key: str) -> Optional[str]:
+    """The lowest sort key which is above every sort key that starts with the given one, or None if there is no such key."""
+    stripped = prefix_sort_key.rstrip(chr(0x10FFFF))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
 def _binary_search(data, item) -> int:
     compare_func = (
         _compare_string_slash_first if isinstance(item, str) else _compare_normal
@@ -39,7 +56,135 @@ def _binary_search(data, item) -> int:
     return -(low + 1)  # item not found
 
 
+def _merge_join(left: list, right: list) -> Iterator[tuple[int, int]]:
+    """Walks two sorted lists of sort keys together, yielding the index of each key on both sides, or -1 on the side it's missing from."""
+    i, j = 0, 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            yield i, -1
+            i += 1
+        elif right[j] < left[i]:
+            yield -1, j
+            j += 1
+        else:
+            yield i, j
+            i += 1
+            j += 1
+    for rest in range(i, len(left)):
+        yield rest, -1
+    for rest in range(j, len(right)):
+        yield -1, rest
+
+
+# the sort keys, keys and values of a sorted map, in order
+_Columns = tuple[list, list, list]
+
+
+def _merge_columns(
+    left: _Columns, right: _Columns, resolve: Optional[Callable[[Any, Any, Any], Any]]
+) -> _Columns:
+    sort_keys, keys, values = [], [], []
+    for i, j in _merge_join(left[0], right[0]):
+        if j < 0:
+            side, index = left, i
+        elif i < 0 or resolve is None:
+            side, index = right, j
+        else:
+            sort_keys.append(left[0][i])
+            keys.append(left[1][i])
+            values.append(resolve(left[1][i], left[2][i], right[2][j]))
+            continue
+        sort_keys.append(side[0][index])
+        keys.append(side[1][index])
+        values.append(side[2][index])
+    return sort_keys, keys, values
+
+
+def _diff_columns(left: _Columns, right: _Columns) -> tuple[_Columns, ...]:
+    added: _Columns = ([], [], [])
+    removed: _Columns = ([], [], [])
+    changed: _Columns = ([], [], [])
+    for i, j in _merge_join(left[0], right[0]):
+        if i < 0:
+            target, side, index = added, right, j
+        elif j < 0:
+            target, side, index = removed, left, i
+        elif left[2][i] != right[2][j]:
+            target, side, index = changed, right, j
+        else:
+            continue
+        for column in range(3):
+            target[column].append(side[column][index])
+    return added, removed, changed
+
+
+class MapDiff(NamedTuple):
+    """The differences between two sorted maps, as maps of the same type."""
+
+    # entries which are only in the other map
+    added: Mapping
+    # entries which are only in this map
+    removed: Mapping
+    # keys which are in both maps with different values, mapped to the value in the other map
+    changed: Mapping
+
+
+# a dict index only pays for itself on larger collections which are looked up repeatedly
+_INDEX_MIN_SIZE = 64
+_INDEX_MIN_LOOKUPS = 16
+
+
+class _SortKeys:
+    """The precomputed `_sort_key` of every key in a sorted collection, plus a dict index which is built on demand."""
+
+    __slots__ = ("__data", "__index", "__lookups", "__stride", "sort_keys")
+
+    def __init__(self, sort_keys: list, data: list, stride: int):
+        self.sort_keys = sort_keys
+        self.__data = data
+        self.__stride = stride
+        self.__index: Optional[dict] = None
+        self.__lookups = 0
+
+    def binary_search(self, item: Any) -> int:
+        """Same result as `_binary_search`."""
+        key = _sort_key(item)
+        sort_keys = self.sort_keys
+        index = bisect_left(sort_keys, key)
+        if index < len(sort_keys) and sort_keys[index] == key:
+            return index
+        return -(index + 1)
+
+    def range_with_prefix(self, prefix: str) -> range:
+        sort_keys = self.sort_keys
+        low = _sort_key(prefix)
+        high = _prefix_end(low)
+        start = bisect_left(sort_keys, low)
+        stop = len(sort_keys) if high is None else bisect_left(sort_keys, high, start)
+        return range(start, stop)
+
+    def index_of(self, item: Any) -> int:
+        """The index of `item`, or -1 if it's absent."""
+        index = self.__index
+        if index is None and len(self.sort_keys) >= _INDEX_MIN_SIZE:
+            self.__lookups += 1
+            if self.__lookups == _INDEX_MIN_LOOKUPS:
+                keys = islice(self.__data, 0, None, self.__stride)
+                # with unhashable keys, stick to binary search
+                with contextlib.suppress(TypeError):
+                    index = self.__index = {key: i for i, key in enumerate(keys)}
+        if index is not None:
+            try:
+                return index.get(item, -1)
+            except TypeError:
+                pass  # an unhashable item can still compare equal to a key
+        found = self.binary_search(item)
+        return found if found >= 0 else -1
+
+
 class ListBackedSet(Set[T], ABC):
+    __slots__ = ()
+
     @abstractmethod
     def __len__(self) -> int: ...
 
@@ -57,15 +202,19 @@ class ListBackedSet(Set[T], ABC):
 
 
 class ArraySet(ListBackedSet[K]):
+    __slots__ = ("__data", "__sort_keys")
+
     __data: list[K]
+    __sort_keys: _SortKeys
 
     def __init__(self):
         raise NotImplementedError("Use ArraySet.empty() or other class methods instead")
 
     @classmethod
-    def __create(cls, data: list[K]) -> "ArraySet[K]":
+    def __create(cls, data: list[K], sort_keys: list) -> "ArraySet[K]":
         instance = super().__new__(cls)
         instance.__data = data  # noqa: SLF001
+        instance.__sort_keys = _SortKeys(sort_keys, data, 1)  # noqa: SLF001
         return instance
 
     def __iter__(self) -> Iterator[K]:
@@ -73,9 +222,26 @@ class ArraySet(ListBackedSet[K]):
 
     @classmethod
     def empty(cls) -> "ArraySet[K]":
-        if not hasattr(cls, "__EMPTY"):
-            cls.__EMPTY = cls.__create([])
-        return cls.__EMPTY
+        try:
+            return cls.__EMPTY
+        except AttributeError:
+            cls.__EMPTY = cls.__create([], [])
+            return cls.__EMPTY
+
+    @classmethod
+    def of(cls, elements: Iterable[K]) -> "ArraySet[K]":
+        """Sorts the elements once, and drops any duplicates."""
+        keyed = sorted(
+            ((_sort_key(element), element) for element in elements),
+            key=itemgetter(0),
+        )
+        data: list[K] = []
+        sort_keys = []
+        for sort_key, element in keyed:
+            if not sort_keys or sort_key != sort_keys[-1]:
+                sort_keys.append(sort_key)
+                data.append(element)
+        return cls.__create(data, sort_keys)
 
     def __len__(self) -> int:
         return len(self.__data)
@@ -83,6 +249,40 @@ class ArraySet(ListBackedSet[K]):
     def __getitem__(self, index: Union[int, slice]) -> Union[K, list[K]]:
         return self.__data[index]
 
+    def __contains__(self, item: Any) -> bool:
+        return self.__sort_keys.index_of(item) >= 0
+
+    def _binary_search(self, item: Any) -> int:
+        return self.__sort_keys.binary_search(item)
+
+    def range_with_prefix(self, prefix: str) -> range:
+        """The indices of every element which starts with `prefix`, found with two binary searches."""
+        return self.__sort_keys.range_with_prefix(prefix)
+
+    def __columns(self) -> _Columns:
+        # a set is a map whose values are its keys
+        return self.__sort_keys.sort_keys, self.__data, self.__data
+
+    def union(self, other: "ArraySet[K]") -> "ArraySet[K]":
+        """Every element of either set, in a single merge of the two."""
+        if not other:
+            return self
+        if not self:
+            return other
+        sort_keys, keys, _ = _merge_columns(
+            self.__columns(), ArraySet.__columns(other), None
+        )
+        return ArraySet.__create(keys, sort_keys)
+
+    def difference(self, other: "ArraySet[K]") -> "ArraySet[K]":
+        """Every element of this set which isn't in `other`, in a single merge of the two."""
+        if not self or not other:
+            return self
+        _, (sort_keys, keys, _), _ = _diff_columns(
+            self.__columns(), ArraySet.__columns(other)
+        )
+        return ArraySet.__create(keys, sort_keys)
+
     def plusOrThis(self, element: K) -> "ArraySet[K]":
         index = self._binary_search(element)
         if index >= 0:
@@ -91,12 +291,23 @@ class ArraySet(ListBackedSet[K]):
             insert_at = -(index + 1)
             new_data = self.__data[:]
             new_data.insert(insert_at, element)
-            return ArraySet.__create(new_data)
+            new_sort_keys = self.__sort_keys.sort_keys[:]
+            new_sort_keys.insert(insert_at, _sort_key(element))
+            return ArraySet.__create(new_data, new_sort_keys)
 
 
 class _ArrayMapKeys(ListBackedSet[K]):
-    def __init__(self, data: list[Union[K, V]]):
+    __slots__ = ("__data", "__sort_keys")
+
+    def __init__(self, data: list[Union[K, V]], sort_keys: _SortKeys):
         self.__data = data
+        self.__sort_keys = sort_keys
+
+    def __contains__(self, item: Any) -> bool:
+        return self.__sort_keys.index_of(item) >= 0
+
+    def _binary_search(self, item: Any) -> int:
+        return self.__sort_keys.binary_search(item)
 
     def __len__(self) -> int:
         return len(self.__data) // 2
@@ -145,37 +356,65 @@ class _ArrayMapEntries(ListBackedSet[tuple[K, V]], ItemsView[K, V]):
 
 
 class ArrayMap(Mapping[K, V]):
+    __slots__ = ("__data", "__sort_keys")
+
     __data: list[Union[K, V]]
-    __keys: ListBackedSet[K]
+    __sort_keys: _SortKeys
 
     def __init__(self):
         raise NotImplementedError("Use ArrayMap.empty() or other class methods instead")
 
     @classmethod
-    def __create(cls, data: list[Union[K, V]]) -> "ArrayMap[K, V]":
+    def __create(cls, data: list[Union[K, V]], sort_keys: list) -> "ArrayMap[K, V]":
         instance = cls.__new__(cls)
         instance.__data = data  # noqa: SLF001
-        instance.__keys = _ArrayMapKeys(data)  # noqa: SLF001
+        instance.__sort_keys = _SortKeys(sort_keys, data, 2)  # noqa: SLF001
         return instance
 
     @classmethod
     def empty(cls) -> "ArrayMap[K, V]":
-        if not hasattr(cls, "__EMPTY"):
-            cls.__EMPTY = cls.__create([])
-        return cls.__EMPTY
+        try:
+            return cls.__EMPTY
+        except AttributeError:
+            cls.__EMPTY = cls.__create([], [])
+            return cls.__EMPTY
+
+    @classmethod
+    def of(cls, pairs: Iterable[tuple[K, V]]) -> "ArrayMap[K, V]":
+        """Sorts the pairs once, in O(n log n) rather than the O(n²) of calling `plus` for each one."""
+        keyed = sorted(
+            ((_sort_key(key), key, value) for key, value in pairs),
+            key=itemgetter(0),
+        )
+        data: list[Union[K, V]] = []
+        sort_keys = []
+        for sort_key, key, value in keyed:
+            if sort_keys and sort_key == sort_keys[-1]:
+                raise KeyError(key)
+            sort_keys.append(sort_key)
+            data.append(key)
+            data.append(value)
+        return cls.__create(data, sort_keys)
+
+    @classmethod
+    def builder(cls) -> "ArrayMapBuilder[K, V]":
+        return ArrayMapBuilder()
 
     def keys(self) -> ListBackedSet[K]:  # type: ignore
-        return self.__keys
+        return _ArrayMapKeys(self.__data, self.__sort_keys)
 
     def items(self) -> _ArrayMapEntries[K, V]:  # type: ignore
         return _ArrayMapEntries(self.__data)
 
     def __getitem__(self, key: K) -> V:
-        index = self._binary_search_key(key)
+        index = self.__sort_keys.index_of(key)
         if index >= 0:
             return self.__data[2 * index + 1]  # type: ignore
         raise KeyError(key)
 
+    def __contains__(self, key: object) -> bool:
+        return self.__sort_keys.index_of(key) >= 0
+
     def __iter__(self) -> Iterator[K]:
         return (self.__data[i] for i in range(0, len(self.__data), 2))  # type: ignore
 
@@ -183,25 +422,76 @@ class ArrayMap(Mapping[K, V]):
         return len(self.__data) // 2
 
     def _binary_search_key(self, key: K) -> int:
-        return _binary_search(self.__keys, key)
+        return self.__sort_keys.binary_search(key)
+
+    def range_with_prefix(self, prefix: str) -> range:
+        """The indices of every key which starts with `prefix`, found with two binary searches."""
+        return self.__sort_keys.range_with_prefix(prefix)
+
+    def __columns(self) -> _Columns:
+        return self.__sort_keys.sort_keys, self.__data[0::2], self.__data[1::2]
+
+    @classmethod
+    def __of_columns(cls, columns: _Columns) -> "ArrayMap[K, V]":
+        sort_keys, keys, values = columns
+        data: list[Union[K, V]] = [None] * (2 * len(keys))  # type: ignore
+        data[0::2] = keys
+        data[1::2] = values
+        return cls.__create(data, sort_keys)
+
+    def merge(
+        self,
+        other: "ArrayMap[K, V]",
+        resolve: Optional[Callable[[K, V, V], V]] = None,
+    ) -> "ArrayMap[K, V]":
+        """
+        Every entry of either map, in a single merge of the two.
+
+        For a key which is in both, `resolve(key, this_value, other_value)` decides the value, by default it's the other one.
+        """
+        if not other:
+            return self
+        if not self and resolve is None:
+            return other
+        return ArrayMap.__of_columns(
+            _merge_columns(self.__columns(), ArrayMap.__columns(other), resolve)
+        )
+
+    def diff(self, other: "ArrayMap[K, V]") -> MapDiff:
+        """What changed from this map to `other`, in a single merge of the two."""
+        added, removed, changed = _diff_columns(
+            self.__columns(), ArrayMap.__columns(other)
+        )
+        return MapDiff(
+            ArrayMap.__of_columns(added),
+            ArrayMap.__of_columns(removed),
+            ArrayMap.__of_columns(changed),
+        )
+
+    def __insert(self, insert_at: int, key: K, value: V) -> "ArrayMap[K, V]":
+        new_data = self.__data[:]
+        new_data.insert(insert_at * 2, key)
+        new_data.insert(insert_at * 2 + 1, value)
+        new_sort_keys = self.__sort_keys.sort_keys[:]
+        new_sort_keys.insert(insert_at, _sort_key(key))
+        return ArrayMap.__create(new_data, new_sort_keys)
 
     def plus(self, key: K, value: V) -> "ArrayMap[K, V]":
         index = self._binary_search_key(key)
         if index >= 0:
             raise KeyError
-        insert_at = -(index + 1)
-        new_data = self.__data[:]
-        new_data.insert(insert_at * 2, key)
-        new_data.insert(insert_at * 2 + 1, value)
-        return ArrayMap.__create(new_data)
+        return self.__insert(-(index + 1), key, value)
 
     def minus_sorted_indices(self, indices: list[int]) -> "ArrayMap[K, V]":
         new_data = self.__data[:]
+        new_sort_keys = self.__sort_keys.sort_keys[:]
         adjusted_indices = [i * 2 for i in indices] + [i * 2 + 1 for i in indices]
         adjusted_indices.sort(reverse=True)
         for index in adjusted_indices:
             del new_data[index]
-        return ArrayMap.__create(new_data)
+        for index in sorted(indices, reverse=True):
+            del new_sort_keys[index]
+        return ArrayMap.__create(new_data, new_sort_keys)
 
     def plus_or_noop(self, key: K, value: V) -> "ArrayMap[K, V]":
         index = self._binary_search_key(key)
@@ -209,30 +499,52 @@ class ArrayMap(Mapping[K, V]):
             return self
         else:
             # Insert new key-value pair
-            insert_at = -(index + 1)
-            new_data = self.__data[:]
-            new_data.insert(insert_at * 2, key)
-            new_data.insert(insert_at * 2 + 1, value)
-            return ArrayMap.__create(new_data)
+            return self.__insert(-(index + 1), key, value)
 
     def plus_or_noop_or_replace(self, key: K, value: V) -> "ArrayMap[K, V]":
         index = self._binary_search_key(key)
         if index >= 0:
             if (self.__data[2 * index + 1]) == value:
                 return self
-            # Replace existing value
+            # Replace existing value, the keys are unchanged so their sort keys are shared
             new_data = self.__data[:]
             new_data[2 * index + 1] = value  # Update the value at the correct position
+            return ArrayMap.__create(new_data, self.__sort_keys.sort_keys)
         else:
             # Insert new key-value pair
-            insert_at = -(index + 1)
-            new_data = self.__data[:]
-            new_data.insert(insert_at * 2, key)
-            new_data.insert(insert_at * 2 + 1, value)
-        return ArrayMap.__create(new_data)
+            return self.__insert(-(index + 1), key, value)
 
     def __str__(self):
         return "{" + ", ".join(f"{k}: {v}" for k, v in self.items()) + "}"
 
     def __repr__(self):
         return self.__str__()
+
+
+class ArrayMapBuilder(Generic[K, V]):
+    """Collects pairs in any order, and then sorts them once into an `ArrayMap`."""
+
+    def __init__(self):
+        self.__pairs: Optional[list[tuple[K, V]]] = []
+
+    def __pairs_or_throw(self) -> list[tuple[K, V]]:
+        if self.__pairs is None:
+            raise ValueError("This builder has already been built.")
+        return self.__pairs
+
+    def __len__(self) -> int:
+        return len(self.__pairs_or_throw())
+
+    def put(self, key: K, value: V) -> "ArrayMapBuilder[K, V]":
+        self.__pairs_or_throw().append((key, value))
+        return self
+
+    def put_all(self, pairs: Iterable[tuple[K, V]]) -> "ArrayMapBuilder[K, V]":
+        self.__pairs_or_throw().extend(pairs)
+        return self
+
+    def build(self) -> ArrayMap[K, V]:
+        """Throws `KeyError` if a key was put twice. The builder can't be used afterwards."""
+        result = ArrayMap.of(self.__pairs_or_throw())
+        self.__pairs = None
+        return result
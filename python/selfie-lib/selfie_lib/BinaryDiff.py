@@ -0,0 +1,66 @@
+import hashlib
+from typing import Optional
+
+from .TextDiff import _common_prefix_length
+
+_ROW = 16
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _row(data: bytes, offset: int) -> str:
+    chunk = data[offset : offset + _ROW]
+    hex_part = " ".join(f"{b:02x}" for b in chunk)
+    text_part = "".join(chr(b) if 32 <= b < 127 else "." for b in chunk)
+    return f"{offset:08x}  {hex_part:<{_ROW * 3 - 1}}  |{text_part}|"
+
+
+class BinaryDiff:
+    """
+    Where two byte strings first differ, as a hexdump of the rows around that offset.
+
+    The first difference is found by comparing chunks natively, and only the rows which are
+    shown are ever formatted, so that it stays fast for huge binaries.
+    """
+
+    __slots__ = ("_lines", "first_offset")
+
+    def __init__(self, first_offset: Optional[int], lines: list[str]):
+        self.first_offset = first_offset
+        self._lines = lines
+
+    @staticmethod
+    def of(expected: bytes, actual: bytes, context: int = 3) -> "BinaryDiff":
+        offset = _common_prefix_length(expected, actual)
+        if offset == len(expected) == len(actual):
+            return BinaryDiff(None, [])
+        lines = [
+            f"first difference at offset {offset} (0x{offset:x})",
+            f"expected: {len(expected)} bytes, blake2b {_digest(expected)}",
+            f"  actual: {len(actual)} bytes, blake2b {_digest(actual)}",
+        ]
+        first_row = offset - offset % _ROW
+        end = max(len(expected), len(actual))
+        for row in range(
+            max(first_row - context * _ROW, 0),
+            min(first_row + (context + 1) * _ROW, end),
+            _ROW,
+        ):
+            expected_row = expected[row : row + _ROW]
+            actual_row = actual[row : row + _ROW]
+            if expected_row == actual_row:
+                lines.append(" " + _row(expected, row))
+            else:
+                if expected_row:
+                    lines.append("-" + _row(expected, row))
+                if actual_row:
+                    lines.append("+" + _row(actual, row))
+        return BinaryDiff(offset, lines)
+
+    def __bool__(self) -> bool:
+        return self.first_offset is not None
+
+    def __str__(self) -> str:
+        return "\n".join(self._lines)
@@ -3,6 +3,7 @@ from collections.abc import Iterable
 from enum import Enum, auto
 
 from .Slice import Slice
+from .SourceCache import SourceCache
 from .TypedPath import TypedPath
 from .WriteTracker import CallStack, SnapshotFileLayout
 
@@ -54,8 +55,7 @@ class CommentTracker:
 
     @staticmethod
     def __commentAndLine(typedPath: TypedPath) -> tuple[WritableComment, int]:
-        with open(typedPath.absolute_path, encoding="utf-8") as file:
-            content = Slice(file.read())
+        content = Slice(SourceCache.shared().read(typedPath))
         for comment_str in [
             "# selfieonce",
             "#selfieonce",
@@ -22,6 +22,8 @@ class Language(Enum):
 
 
 class LiteralValue:
+    __slots__ = ("actual", "expected", "format")
+
     def __init__(self, expected: Optional[T], actual: T, fmt: "LiteralFormat") -> None:
         self.expected = expected
         self.actual = actual
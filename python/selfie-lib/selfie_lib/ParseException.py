@@ -1,7 +1,13 @@
+from typing import Union
+
 from .LineReader import LineReader
 
 
 class ParseException(Exception):
-    def __init__(self, line_reader: LineReader, message: str) -> None:
-        self.line: int = line_reader.get_line_number()
+    def __init__(self, line_reader: Union[LineReader, int], message: str) -> None:
+        self.line: int = (
+            line_reader
+            if isinstance(line_reader, int)
+            else line_reader.get_line_number()
+        )
         super().__init__(f"Line {self.line}: {message}")
@@ -1,3 +1,6 @@
+import re
+
+
 class PerCharacterEscaper:
     def __init__(
         self,
@@ -5,71 +8,45 @@ class PerCharacterEscaper:
         escaped_code_points: list[int],
         escaped_by_code_points: list[int],
     ):
-        self.__escape_code_point: int = escape_code_point
-        self.__escaped_code_points: list[int] = escaped_code_points
-        self.__escaped_by_code_points: list[int] = escaped_by_code_points
+        self.__escape_char: str = chr(escape_code_point)
+
+        # compile the policy into lookup tables, where the first mention of a code point wins
+        escape_char = self.__escape_char
+        self.__escapes: dict[str, str] = {}
+        self.__unescapes: dict[str, str] = {}
+        for escaped, escaped_by in zip(escaped_code_points, escaped_by_code_points):
+            self.__escapes.setdefault(chr(escaped), escape_char + chr(escaped_by))
+            self.__unescapes.setdefault(chr(escaped_by), chr(escaped))
+        self.__needs_escape = re.compile(
+            "[" + "".join(re.escape(c) for c in self.__escapes) + "]"
+        )
+        self.__escape_sequence = re.compile(re.escape(escape_char) + ".", re.DOTALL)
+
+    def __escape_match(self, match: "re.Match[str]") -> str:
+        return self.__escapes[match.group(0)]
 
-    def __first_offset_needing_escape(self, input_string: str) -> int:
-        length: int = len(input_string)
-        for offset in range(length):
-            codepoint: int = ord(input_string[offset])
-            if (
-                codepoint == self.__escape_code_point
-                or codepoint in self.__escaped_code_points
-            ):
-                return offset
-        return -1
+    def __unescape_match(self, match: "re.Match[str]") -> str:
+        escaped_by: str = match.group(0)[1]
+        return self.__unescapes.get(escaped_by, escaped_by)
 
     def escape(self, input_string: str) -> str:
-        no_escapes: int = self.__first_offset_needing_escape(input_string)
-        if no_escapes == -1:
+        # a substring search per escaped character is much faster than one regex search
+        if not any(escaped in input_string for escaped in self.__escapes):
             return input_string
-        else:
-            result: list[str] = []
-            result.append(input_string[:no_escapes])
-            for char in input_string[no_escapes:]:
-                codepoint: int = ord(char)
-                if codepoint in self.__escaped_code_points:
-                    idx: int = self.__escaped_code_points.index(codepoint)
-                    result.append(chr(self.__escape_code_point))
-                    result.append(chr(self.__escaped_by_code_points[idx]))
-                else:
-                    result.append(char)
-            return "".join(result)
+        return self.__needs_escape.sub(self.__escape_match, input_string)
 
     def unescape(self, input_string: str) -> str:
-        if input_string.endswith(
-            chr(self.__escape_code_point)
-        ) and not input_string.endswith(chr(self.__escape_code_point) * 2):
+        escape_char = self.__escape_char
+        if input_string.endswith(escape_char) and not input_string.endswith(
+            escape_char * 2
+        ):
             raise ValueError(
-                f"Escape character '{chr(self.__escape_code_point)}' can't be the last character in a string."
+                f"Escape character '{escape_char}' can't be the last character in a string."
             )
 
-        no_escapes: int = self.__first_offset_needing_escape(input_string)
-        if no_escapes == -1:
+        if escape_char not in input_string:
             return input_string
-        else:
-            result: list[str] = [input_string[:no_escapes]]
-            skip_next: bool = False
-            for i in range(no_escapes, len(input_string)):
-                if skip_next:
-                    skip_next = False
-                    continue
-                codepoint: int = ord(input_string[i])
-                if codepoint == self.__escape_code_point and (i + 1) < len(
-                    input_string
-                ):
-                    next_codepoint: int = ord(input_string[i + 1])
-                    if next_codepoint in self.__escaped_by_code_points:
-                        idx: int = self.__escaped_by_code_points.index(next_codepoint)
-                        result.append(chr(self.__escaped_code_points[idx]))
-                        skip_next = True
-                    else:
-                        result.append(input_string[i + 1])
-                        skip_next = True
-                else:
-                    result.append(chr(codepoint))
-            return "".join(result)
+        return self.__escape_sequence.sub(self.__unescape_match, input_string)
 
     @classmethod
     def self_escape(cls, escape_policy: str) -> "PerCharacterEscaper":
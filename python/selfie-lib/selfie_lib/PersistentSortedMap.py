@@ -0,0 +1,441 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import ItemsView, Iterable, Iterator, Mapping, ValuesView
+from operator import itemgetter
+from typing import Any, Callable, Optional, TypeVar, Union
+
+from .ArrayMap import (
+    ListBackedSet,
+    MapDiff,
+    _Columns,
+    _diff_columns,
+    _merge_columns,
+    _prefix_end,
+    _sort_key,
+)
+
+V = TypeVar("V")
+K = TypeVar("K")
+
+# the most entries in a leaf, and the most children of a branch
+_MAX_CHUNK = 64
+
+
+class _Leaf:
+    __slots__ = ("keys", "sort_keys", "values")
+
+    def __init__(self, sort_keys: list, keys: list, values: list):
+        self.sort_keys = sort_keys
+        self.keys = keys
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def low(self):
+        return self.sort_keys[0]
+
+
+class _Branch:
+    __slots__ = ("children", "counts", "lows", "size")
+
+    def __init__(self, lows: list, counts: list[int], children: list):
+        # the lowest sort key and the number of entries of each child
+        self.lows = lows
+        self.counts = counts
+        self.children = children
+        self.size = sum(counts)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def low(self):
+        return self.lows[0]
+
+
+_Node = Union[_Leaf, _Branch]
+
+# what `_with` does when the key is already present
+_RAISE = 0
+_NOOP = 1
+_REPLACE = 2
+
+
+def _split(node: _Node) -> tuple[_Node, ...]:
+    if isinstance(node, _Leaf):
+        if len(node) <= _MAX_CHUNK:
+            return (node,)
+        half = len(node) // 2
+        return (
+            _Leaf(node.sort_keys[:half], node.keys[:half], node.values[:half]),
+            _Leaf(node.sort_keys[half:], node.keys[half:], node.values[half:]),
+        )
+    if len(node.children) <= _MAX_CHUNK:
+        return (node,)
+    half = len(node.children) // 2
+    return (
+        _Branch(node.lows[:half], node.counts[:half], node.children[:half]),
+        _Branch(node.lows[half:], node.counts[half:], node.children[half:]),
+    )
+
+
+def _with(
+    node: _Node, sort_key, key, value, on_existing: int
+) -> Optional[tuple[_Node, ...]]:
+    """The nodes which replace `node` once it holds `key`, or None if `node` is unchanged."""
+    if isinstance(node, _Leaf):
+        i = bisect_left(node.sort_keys, sort_key)
+        if i < len(node) and node.sort_keys[i] == sort_key:
+            if on_existing == _RAISE:
+                raise KeyError(key)
+            if on_existing == _NOOP or node.values[i] == value:
+                return None
+            values = node.values[:]
+            values[i] = value
+            return (_Leaf(node.sort_keys, node.keys, values),)
+        sort_keys = node.sort_keys[:]
+        sort_keys.insert(i, sort_key)
+        keys = node.keys[:]
+        keys.insert(i, key)
+        values = node.values[:]
+        values.insert(i, value)
+        return _split(_Leaf(sort_keys, keys, values))
+    i = max(bisect_right(node.lows, sort_key) - 1, 0)
+    replaced = _with(node.children[i], sort_key, key, value, on_existing)
+    if replaced is None:
+        return None
+    lows = node.lows[:]
+    lows[i : i + 1] = [child.low() for child in replaced]
+    counts = node.counts[:]
+    counts[i : i + 1] = [len(child) for child in replaced]
+    children = node.children[:]
+    children[i : i + 1] = replaced
+    return _split(_Branch(lows, counts, children))
+
+
+def _without(node: _Node, index: int) -> Optional[_Node]:
+    """`node` without the entry at `index`, or None if that was its last entry."""
+    if isinstance(node, _Leaf):
+        if len(node) == 1:
+            return None
+        sort_keys = node.sort_keys[:]
+        del sort_keys[index]
+        keys = node.keys[:]
+        del keys[index]
+        values = node.values[:]
+        del values[index]
+        return _Leaf(sort_keys, keys, values)
+    i = 0
+    while index >= node.counts[i]:
+        index -= node.counts[i]
+        i += 1
+    child = _without(node.children[i], index)
+    lows = node.lows[:]
+    counts = node.counts[:]
+    children = node.children[:]
+    if child is None:
+        # underfull nodes aren't merged, only empty ones are removed
+        if len(children) == 1:
+            return None
+        del lows[i], counts[i], children[i]
+    else:
+        lows[i] = child.low()
+        counts[i] = len(child)
+        children[i] = child
+    return _Branch(lows, counts, children)
+
+
+def _build(sort_keys: list, keys: list, values: list) -> Optional[_Node]:
+    """A tree over entries which are already sorted, with full nodes."""
+    if not keys:
+        return None
+    level: list[_Node] = [
+        _Leaf(
+            sort_keys[i : i + _MAX_CHUNK],
+            keys[i : i + _MAX_CHUNK],
+            values[i : i + _MAX_CHUNK],
+        )
+        for i in range(0, len(keys), _MAX_CHUNK)
+    ]
+    while len(level) > 1:
+        level = [
+            _Branch(
+                [child.low() for child in chunk],
+                [len(child) for child in chunk],
+                chunk,
+            )
+            for chunk in (
+                level[i : i + _MAX_CHUNK] for i in range(0, len(level), _MAX_CHUNK)
+            )
+        ]
+    return level[0]
+
+
+def _leaves(node: Optional[_Node]) -> Iterator[_Leaf]:
+    if node is None:
+        return
+    if isinstance(node, _Leaf):
+        yield node
+    else:
+        for child in node.children:
+            yield from _leaves(child)
+
+
+def _rank(node: Optional[_Node], sort_key) -> int:
+    """The number of entries whose sort key is below `sort_key`."""
+    rank = 0
+    while isinstance(node, _Branch):
+        i = max(bisect_left(node.lows, sort_key) - 1, 0)
+        rank += sum(node.counts[:i])
+        node = node.children[i]
+    return rank if node is None else rank + bisect_left(node.sort_keys, sort_key)
+
+
+def _leaf_at(node: _Node, index: int) -> tuple[_Leaf, int]:
+    while isinstance(node, _Branch):
+        i = 0
+        while index >= node.counts[i]:
+            index -= node.counts[i]
+            i += 1
+        node = node.children[i]
+    return node, index
+
+
+class _PersistentSortedMapKeys(ListBackedSet[K]):
+    def __init__(self, sorted_map: "PersistentSortedMap[K, Any]"):
+        self.__map = sorted_map
+
+    def __len__(self) -> int:
+        return len(self.__map)
+
+    def __getitem__(self, index: Union[int, slice]):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.__map._entry_at(index)[0]  # noqa: SLF001
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.__map)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self.__map
+
+
+class _PersistentSortedMapEntries(ListBackedSet[tuple[K, V]], ItemsView[K, V]):
+    def __init__(self, sorted_map: "PersistentSortedMap[K, V]"):
+        self.__map = sorted_map
+
+    def __len__(self) -> int:
+        return len(self.__map)
+
+    def __getitem__(self, index: Union[int, slice]):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.__map._entry_at(index)  # noqa: SLF001
+
+    def __iter__(self) -> Iterator[tuple[K, V]]:
+        for leaf in _leaves(self.__map._root):  # noqa: SLF001
+            yield from zip(leaf.keys, leaf.values)
+
+
+class _PersistentSortedMapValues(ValuesView[V]):
+    def __init__(self, sorted_map: "PersistentSortedMap[Any, V]"):
+        super().__init__(sorted_map)
+        self.__map = sorted_map
+
+    def __iter__(self) -> Iterator[V]:
+        for leaf in _leaves(self.__map._root):  # noqa: SLF001
+            yield from leaf.values
+
+
+class PersistentSortedMap(Mapping[K, V]):
+    """
+    Has the same API and order as `ArrayMap`, but changing it costs O(log n) rather than O(n),
+    because every change only copies the path to the changed entry, and shares the rest of the tree.
+    """
+
+    __slots__ = ("_root",)
+
+    _root: Optional[_Node]
+
+    def __init__(self):
+        raise NotImplementedError(
+            "Use PersistentSortedMap.empty() or other class methods instead"
+        )
+
+    @classmethod
+    def __create(cls, root: Optional[_Node]) -> "PersistentSortedMap[K, V]":
+        instance = cls.__new__(cls)
+        instance._root = root  # noqa: SLF001
+        return instance
+
+    @classmethod
+    def empty(cls) -> "PersistentSortedMap[K, V]":
+        try:
+            return cls.__EMPTY
+        except AttributeError:
+            cls.__EMPTY = cls.__create(None)
+            return cls.__EMPTY
+
+    @classmethod
+    def of(cls, pairs: Iterable[tuple[K, V]]) -> "PersistentSortedMap[K, V]":
+        keyed = sorted(
+            ((_sort_key(key), key, value) for key, value in pairs),
+            key=itemgetter(0),
+        )
+        for i in range(1, len(keyed)):
+            if keyed[i][0] == keyed[i - 1][0]:
+                raise KeyError(keyed[i][1])
+        return cls.__create(
+            _build(
+                [entry[0] for entry in keyed],
+                [entry[1] for entry in keyed],
+                [entry[2] for entry in keyed],
+            )
+        )
+
+    def keys(self) -> ListBackedSet[K]:  # type: ignore
+        return _PersistentSortedMapKeys(self)
+
+    def items(self) -> _PersistentSortedMapEntries[K, V]:  # type: ignore
+        return _PersistentSortedMapEntries(self)
+
+    def values(self) -> ValuesView[V]:
+        return _PersistentSortedMapValues(self)
+
+    def __find(self, key: Any) -> tuple[Optional[_Leaf], int]:
+        node = self._root
+        if node is None:
+            return None, -1
+        sort_key = _sort_key(key)
+        while isinstance(node, _Branch):
+            node = node.children[max(bisect_right(node.lows, sort_key) - 1, 0)]
+        i = bisect_left(node.sort_keys, sort_key)
+        if i < len(node) and node.sort_keys[i] == sort_key:
+            return node, i
+        return None, -1
+
+    def __getitem__(self, key: K) -> V:
+        leaf, i = self.__find(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf.values[i]
+
+    def __contains__(self, key: object) -> bool:
+        return self.__find(key)[0] is not None
+
+    def __iter__(self) -> Iterator[K]:
+        for leaf in _leaves(self._root):
+            yield from leaf.keys
+
+    def __len__(self) -> int:
+        return 0 if self._root is None else len(self._root)
+
+    def _entry_at(self, index: int) -> tuple[K, V]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        leaf, i = _leaf_at(self._root, index)  # type: ignore
+        return (leaf.keys[i], leaf.values[i])
+
+    def range_with_prefix(self, prefix: str) -> range:
+        """The indices of every key which starts with `prefix`, see `ArrayMap.range_with_prefix`."""
+        low = _sort_key(prefix)
+        high = _prefix_end(low)
+        start = _rank(self._root, low)
+        return range(start, len(self) if high is None else _rank(self._root, high))
+
+    def __columns(self) -> _Columns:
+        columns: _Columns = ([], [], [])
+        for leaf in _leaves(self._root):
+            columns[0].extend(leaf.sort_keys)
+            columns[1].extend(leaf.keys)
+            columns[2].extend(leaf.values)
+        return columns
+
+    def merge(
+        self,
+        other: "PersistentSortedMap[K, V]",
+        resolve: Optional[Callable[[K, V, V], V]] = None,
+    ) -> "PersistentSortedMap[K, V]":
+        """Same as `ArrayMap.merge`."""
+        if not other:
+            return self
+        if not self and resolve is None:
+            return other
+        return PersistentSortedMap.__create(
+            _build(
+                *_merge_columns(
+                    self.__columns(), PersistentSortedMap.__columns(other), resolve
+                )
+            )
+        )
+
+    def diff(self, other: "PersistentSortedMap[K, V]") -> MapDiff:
+        """Same as `ArrayMap.diff`."""
+        added, removed, changed = _diff_columns(
+            self.__columns(), PersistentSortedMap.__columns(other)
+        )
+        return MapDiff(
+            PersistentSortedMap.__create(_build(*added)),
+            PersistentSortedMap.__create(_build(*removed)),
+            PersistentSortedMap.__create(_build(*changed)),
+        )
+
+    def __with(self, key: K, value: V, on_existing: int) -> "PersistentSortedMap[K, V]":
+        sort_key = _sort_key(key)
+        if self._root is None:
+            return PersistentSortedMap.__create(_Leaf([sort_key], [key], [value]))
+        replaced = _with(self._root, sort_key, key, value, on_existing)
+        if replaced is None:
+            return self
+        elif len(replaced) == 1:
+            return PersistentSortedMap.__create(replaced[0])
+        else:
+            return PersistentSortedMap.__create(
+                _Branch(
+                    [node.low() for node in replaced],
+                    [len(node) for node in replaced],
+                    list(replaced),
+                )
+            )
+
+    def plus(self, key: K, value: V) -> "PersistentSortedMap[K, V]":
+        return self.__with(key, value, _RAISE)
+
+    def plus_or_noop(self, key: K, value: V) -> "PersistentSortedMap[K, V]":
+        return self.__with(key, value, _NOOP)
+
+    def plus_or_noop_or_replace(self, key: K, value: V) -> "PersistentSortedMap[K, V]":
+        return self.__with(key, value, _REPLACE)
+
+    def minus_sorted_indices(self, indices: list[int]) -> "PersistentSortedMap[K, V]":
+        if not indices:
+            return self
+        if len(indices) * 8 > len(self):
+            # removing this many entries one at a time costs more than a rebuild
+            removed = set(indices)
+            kept = [
+                (leaf.sort_keys[i], leaf.keys[i], leaf.values[i])
+                for leaf in _leaves(self._root)
+                for i in range(len(leaf))
+            ]
+            kept = [entry for i, entry in enumerate(kept) if i not in removed]
+            return PersistentSortedMap.__create(
+                _build(
+                    [entry[0] for entry in kept],
+                    [entry[1] for entry in kept],
+                    [entry[2] for entry in kept],
+                )
+            )
+        root = self._root
+        for index in sorted(indices, reverse=True):
+            root = _without(root, index)  # type: ignore
+            while isinstance(root, _Branch) and len(root.children) == 1:
+                root = root.children[0]
+        return PersistentSortedMap.__create(root)
+
+    def __str__(self):
+        return "{" + ", ".join(f"{k}: {v}" for k, v in self.items()) + "}"
+
+    def __repr__(self):
+        return self.__str__()
@@ -1,7 +1,8 @@
 import base64
 from abc import ABC, abstractmethod
 from itertools import chain
-from typing import Any, Generic, Optional, TypeVar
+from typing import TYPE_CHECKING, Any, Generic, Optional, TypeVar
+from weakref import WeakKeyDictionary
 
 from .Literals import (
     LiteralFormat,
@@ -13,8 +14,12 @@ from .Literals import (
 from .Snapshot import Snapshot
 from .SnapshotFile import SnapshotFile
 from .SnapshotSystem import DiskStorage, Mode, SnapshotSystem, _selfieSystem
+from .WriteTracker import _caller_frame
 from .WriteTracker import recordCall as recordCall
 
+if TYPE_CHECKING:
+    from types import CodeType
+
 T = TypeVar("T")
 
 
@@ -253,8 +258,25 @@ class BinarySelfie(ReprSelfie[bytes], BinaryFacet):
         return self._to_be_file_impl(subpath, False)
 
 
+# code objects whose source file has already passed `_check_src`, for each running system
+_checked_src: "WeakKeyDictionary[SnapshotSystem, set[CodeType]]" = WeakKeyDictionary()
+
+
 def _check_src(value: T) -> T:
-    _selfieSystem().mode.can_write(False, recordCall(True), _selfieSystem())
+    system = _selfieSystem()
+    if system.mode == Mode.overwrite:
+        # overwrite mode doesn't care about comments
+        return value
+    checked = _checked_src.get(system)
+    if checked is None:
+        checked = _checked_src.setdefault(system, set())
+    caller = _caller_frame().f_code
+    if caller in checked:
+        # the comment of a source file doesn't change during a run, so checking it again is a no-op
+        return value
+    # throws if there is a writable comment in readonly mode
+    system.mode.can_write(False, recordCall(True), system)
+    checked.add(caller)
     return value
 
 
@@ -308,8 +330,8 @@ def _assert_equal(
         expectedFacets = _serialize_only_facets(expected, mismatched_keys)
         actualFacets = _serialize_only_facets(actual, mismatched_keys)
         raise storage.fs.assert_failed(
-            message=storage.mode.msg_snapshot_mismatch(
-                expected=expectedFacets, actual=actualFacets
+            message=storage.mode.msg_snapshot_mismatch_facets(
+                expected, actual, mismatched_keys
             ),
             expected=expectedFacets,
             actual=actualFacets,
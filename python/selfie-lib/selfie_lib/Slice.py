@@ -1,10 +1,11 @@
-from collections import Counter
 from typing import Optional, Union
 
 
 class Slice:
     """Represents a slice of a base string from startIndex to endIndex."""
 
+    __slots__ = ("base", "endIndex", "startIndex")
+
     def __init__(
         self, base: str, startIndex: int = 0, endIndex: Optional[int] = None
     ) -> None:
@@ -29,11 +30,10 @@ class Slice:
         return Slice(self.base, self.startIndex + start, self.startIndex + end)
 
     def trim(self) -> "Slice":
-        start, end = 0, len(self)
-        while start < end and self[start].isspace():
-            start += 1
-        while start < end and self[end - 1].isspace():
-            end -= 1
+        # `str.strip()` removes exactly the characters which are `isspace()`
+        content = str(self)
+        start = len(content) - len(content.lstrip())
+        end = max(len(content.rstrip()), start)
         return self.subSequence(start, end) if start > 0 or end < len(self) else self
 
     def __str__(self) -> str:
@@ -43,9 +43,7 @@ class Slice:
         if isinstance(other, Slice):
             return str(self) == str(other)
         elif isinstance(other, str):
-            if len(self) != len(other):
-                return False
-            return all(self[i] == other[i] for i in range(len(self)))
+            return len(self) == len(other) and self.starts_with(other)
         return False
 
     def indexOf(self, lookingFor: str, startOffset: int = 0) -> int:
@@ -76,21 +74,16 @@ class Slice:
         return False
 
     def __hash__(self) -> int:
-        h = 0
-        for i in range(len(self)):
-            h = 31 * h + ord(self[i])
-        return h
+        return hash(str(self))
 
     def replaceSelfWith(self, s: str) -> str:
         return self.base[: self.startIndex] + s + self.base[self.endIndex :]
 
     def count(self, char: str) -> int:
-        return Counter(self.base[self.startIndex : self.endIndex])[char]
+        return self.base.count(char, self.startIndex, self.endIndex)
 
     def baseLineAtOffset(self, index: int) -> int:
-        return 1 + Slice(self.base, 0, index).count("\n")
+        return 1 + self.base.count("\n", 0, index)
 
     def starts_with(self, prefix: str) -> bool:
-        if len(prefix) > len(self):
-            return False
-        return all(self[i] == prefix[i] for i in range(len(prefix)))
+        return self.base.startswith(prefix, self.startIndex, self.endIndex)
@@ -1,3 +1,4 @@
+import sys
 from collections.abc import Iterator
 from typing import Union
 
@@ -7,6 +8,8 @@ from .SnapshotValue import SnapshotValue
 
 
 class Snapshot:
+    __slots__ = ("_facet_data", "_hash", "_subject")
+
     def __init__(
         self,
         subject: SnapshotValue,
@@ -14,6 +17,7 @@ class Snapshot:
     ):
         self._subject = subject
         self._facet_data = facet_data
+        self._hash: Union[int, None] = None
 
     @property
     def subject(self) -> SnapshotValue:
@@ -26,10 +30,27 @@ class Snapshot:
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, Snapshot):
             return NotImplemented
-        return self._subject == other._subject and self._facet_data == other._facet_data
+        if self is other:
+            return True
+        if self._subject != other._subject:
+            return False
+        facets, other_facets = self._facet_data, other._facet_data
+        if len(facets) != len(other_facets):
+            return False
+        # both are sorted by key, so compare pairwise instead of building dicts
+        return all(
+            key == other_key and value == other_value
+            for (key, value), (other_key, other_value) in zip(
+                facets.items(), other_facets.items()
+            )
+        )
 
     def __hash__(self) -> int:
-        return hash((self._subject, tuple(self._facet_data.items())))
+        cached = self._hash
+        if cached is None:
+            cached = hash((self._subject, tuple(self._facet_data.items())))
+            self._hash = cached
+        return cached
 
     def plus_facet(
         self, key: str, value: Union[bytes, str, SnapshotValue]
@@ -38,7 +59,7 @@ class Snapshot:
             raise ValueError("The empty string is reserved for the subject.")
         return Snapshot(
             self._subject,
-            self._facet_data.plus(_to_unix(key), SnapshotValue.of(value)),
+            self._facet_data.plus(sys.intern(_to_unix(key)), SnapshotValue.of(value)),
         )
 
     def plus_or_replace(
@@ -50,7 +71,7 @@ class Snapshot:
             return Snapshot(
                 self._subject,
                 self._facet_data.plus_or_noop_or_replace(
-                    _to_unix(key), SnapshotValue.of(value)
+                    sys.intern(_to_unix(key)), SnapshotValue.of(value)
                 ),
             )
 
@@ -72,7 +93,7 @@ class Snapshot:
     @staticmethod
     def of_items(items: Iterator[tuple[str, SnapshotValue]]) -> "Snapshot":
         subject = None
-        facets = ArrayMap.empty()
+        facets = ArrayMap.builder()
         for entry in items:
             (key, value) = entry
             if key == "":
@@ -82,8 +103,12 @@ class Snapshot:
                     )
                 subject = value
             else:
-                facets = facets.plus(key, value)
-        return Snapshot(subject if subject else SnapshotValue.of(""), facets)
+                facets.put(key, value)
+        return Snapshot(subject if subject else SnapshotValue.of(""), facets.build())
+
+    @staticmethod
+    def builder(subject: Union[bytes, str, SnapshotValue] = "") -> "SnapshotBuilder":
+        return SnapshotBuilder(subject)
 
     def items(self) -> Iterator[tuple[str, SnapshotValue]]:
         yield ("", self._subject)
@@ -94,3 +119,37 @@ class Snapshot:
         for e in self.facets.items():
             pieces.append(f"\n  .plus_facet({e[0]!r}, {e[1].value_string()!r})")  # noqa: PERF401
         return "".join(pieces)
+
+
+class SnapshotBuilder:
+    """A mutable `Snapshot`, for cameras which attach many facets without copying the snapshot for each one."""
+
+    def __init__(self, subject: Union[bytes, str, SnapshotValue] = ""):
+        self.__subject = SnapshotValue.of(subject)
+        self.__facets: dict[str, SnapshotValue] = {}
+
+    def set_subject(self, value: Union[bytes, str, SnapshotValue]) -> "SnapshotBuilder":
+        self.__subject = SnapshotValue.of(value)
+        return self
+
+    def plus_facet(
+        self, key: str, value: Union[bytes, str, SnapshotValue]
+    ) -> "SnapshotBuilder":
+        if key == "":
+            raise ValueError("The empty string is reserved for the subject.")
+        key = sys.intern(_to_unix(key))
+        if key in self.__facets:
+            raise KeyError(key)
+        self.__facets[key] = SnapshotValue.of(value)
+        return self
+
+    def plus_or_replace(
+        self, key: str, value: Union[bytes, str, SnapshotValue]
+    ) -> "SnapshotBuilder":
+        if key == "":
+            return self.set_subject(value)
+        self.__facets[sys.intern(_to_unix(key))] = SnapshotValue.of(value)
+        return self
+
+    def build(self) -> Snapshot:
+        return Snapshot(self.__subject, ArrayMap.of(self.__facets.items()))
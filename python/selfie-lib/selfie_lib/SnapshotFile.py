@@ -1,12 +1,86 @@
 import base64
-from threading import Lock
-from typing import Optional
+import contextlib
+import mmap
+import os
+import shutil
+from collections.abc import Iterable
+from threading import Lock, get_ident
+from typing import Any, BinaryIO, Callable, Optional, Protocol, Union
 
 from .ArrayMap import ArrayMap
+from .ConvertToWindowsNewlines import ConvertToWindowsNewlines
+from .PersistentSortedMap import PersistentSortedMap
 from .Snapshot import Snapshot, SnapshotValue
+from .SnapshotFileScanner import SnapshotEntry, SnapshotFileScanner
 from .SnapshotReader import SnapshotReader
 from .SnapshotValueReader import SnapshotValueReader
 
+# a multiple of 3, so that the chunks encode to the same base64 as the whole
+_BASE64_CHUNK_BYTES = 3 * 16 * 1024
+
+
+class _ValueWriter(Protocol):
+    def append(self, value: str, /) -> Any: ...
+
+
+class _FileSink:
+    """
+    Writes UTF-8 into a temporary file next to `path`, which replaces `path` on `commit`.
+
+    If `original` is given, nothing is written until the content starts to differ from it.
+    """
+
+    def __init__(self, path: str, original: Optional[Union[bytes, mmap.mmap]]):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}-{get_ident()}.tmp"
+        self.original = original
+        self.position = 0
+        self.file: Optional[BinaryIO] = None
+        if original is None:
+            self.__open()
+
+    def __open(self) -> None:
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+        self.file = open(os.open(self.temp_path, flags, 0o666), "wb")  # noqa: SIM115
+        if self.original is not None:
+            self.file.write(self.original[: self.position])
+
+    def write(self, value: str) -> None:
+        self.write_bytes(value.encode("utf-8"))
+
+    append = write
+
+    def write_bytes(self, raw: Union[bytes, memoryview]) -> None:
+        if self.file is None:
+            assert self.original is not None
+            end = self.position + len(raw)
+            if self.original[self.position : end] == raw:
+                self.position = end
+                return
+            self.__open()
+        self.file.write(raw)  # type: ignore[union-attr]
+
+    def commit(self, before_replace: Callable[[], None]) -> bool:
+        """Replaces `path` with what was written, and returns False if it was already identical."""
+        if self.file is None:
+            assert self.original is not None
+            if self.position == len(self.original):
+                return False
+            self.__open()
+        self.file.close()  # type: ignore[union-attr]
+        # the temp file was created with the default mode, so keep the one of the file it replaces
+        with contextlib.suppress(FileNotFoundError):
+            shutil.copymode(self.path, self.temp_path)
+        before_replace()
+        os.replace(self.temp_path, self.path)
+        return True
+
+    def abort(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            with contextlib.suppress(OSError):
+                os.remove(self.temp_path)
+
 
 class SnapshotFile:
     HEADER_PREFIX: str = "📷 "
@@ -15,11 +89,20 @@ class SnapshotFile:
     def __init__(self):
         self.unix_newlines: bool = True
         self.metadata: Optional[tuple[str, str]] = None
-        self.snapshots: ArrayMap[str, Snapshot] = ArrayMap.empty()
+        self.snapshots: PersistentSortedMap[str, Snapshot] = PersistentSortedMap.empty()
         self._lock: Lock = Lock()
         self.was_set_at_test_time: bool = False
+        self._scanner: Optional[SnapshotFileScanner] = None
+        self._mapped_path: Optional[str] = None
+
+    def serialize(self, valueWriter: _ValueWriter):
+        self.__serialize(valueWriter, None)
+
+    def __serialize(self, valueWriter: _ValueWriter, sink: Optional[_FileSink]):
+        raw_scanner = self._scanner if sink is not None else None
+        if raw_scanner is not None and raw_scanner.unix_newlines != self.unix_newlines:
+            raw_scanner = None
 
-    def serialize(self, valueWriter: list[str]):
         if self.metadata is not None:
             self.writeEntry(
                 valueWriter,
@@ -29,6 +112,12 @@ class SnapshotFile:
             )
 
         for entry_key, entry_value in self.snapshots.items():
+            if raw_scanner is not None and isinstance(entry_value, _LazySnapshot):
+                raw = entry_value.raw_bytes_in(raw_scanner)
+                if raw is not None:
+                    # unchanged since it was parsed, so the original bytes are still right
+                    sink.write_bytes(raw)  # type: ignore[union-attr]
+                    continue
             self.writeEntry(valueWriter, entry_key, None, entry_value.subject)
             for facet_key, facet_value in entry_value.facets.items():
                 self.writeEntry(valueWriter, entry_key, facet_key, facet_value)
@@ -37,7 +126,7 @@ class SnapshotFile:
 
     @staticmethod
     def writeEntry(
-        valueWriter: list[str], key: str, facet: Optional[str], value: SnapshotValue
+        valueWriter: _ValueWriter, key: str, facet: Optional[str], value: SnapshotValue
     ):
         valueWriter.append("╔═ ")
         valueWriter.append(SnapshotValueReader.name_esc.escape(key))
@@ -56,8 +145,10 @@ class SnapshotFile:
             return
 
         if value.is_binary:
-            escaped = base64.b64encode(value.value_binary()).decode("utf-8")
-            valueWriter.append(escaped.replace("\r", ""))
+            binary = memoryview(value.value_binary())
+            for start in range(0, len(binary), _BASE64_CHUNK_BYTES):
+                chunk = binary[start : start + _BASE64_CHUNK_BYTES]
+                valueWriter.append(base64.b64encode(chunk).decode("ascii"))
         else:
             escaped = SnapshotValueReader.body_esc.escape(value.value_string()).replace(
                 "\n╔", "\n\ud801\udf41"
@@ -65,6 +156,38 @@ class SnapshotFile:
             valueWriter.append(escaped)
         valueWriter.append("\n")
 
+    def write_file(self, path: str) -> bool:
+        """
+        Streams `serialize` into the file at `path`, with windows newlines unless `unix_newlines`.
+
+        Snapshots which haven't changed since `map_file` are copied byte for byte, and if the
+        result is identical to the file which was mapped, nothing is written at all. Otherwise
+        the content goes into a temporary file next to `path` which then replaces it, so an
+        interrupted write never leaves a truncated file behind.
+
+        Returns whether the file was written.
+        """
+        original = None
+        if self._scanner is not None and self._mapped_path == path:
+            original = self._scanner.content
+        sink = _FileSink(path, original)
+        try:
+            if self.unix_newlines:
+                self.__serialize(sink, sink)
+            else:
+                self.__serialize(ConvertToWindowsNewlines(sink), sink)
+            # release the mapping, because windows can't replace a mapped file
+            written = sink.commit(self.close)
+        except BaseException:
+            sink.abort()
+            raise
+        finally:
+            # even if nothing was written, the mapping isn't needed anymore
+            self.close()
+        if written:
+            self._mapped_path = None
+        return written
+
     def set_at_test_time(self, key: str, snapshot: Snapshot) -> None:
         with self._lock:
             self.snapshots = self.snapshots.plus_or_noop_or_replace(key, snapshot)
@@ -88,21 +211,159 @@ class SnapshotFile:
             metadata_name = peek_key[len(cls.HEADER_PREFIX) :]
             metadata_value = value_reader.next_value().value_string()
             result.metadata = (metadata_name, metadata_value)
-            reader.next_snapshot()
 
+        snapshots: list[tuple[str, Snapshot]] = []
         while True:
             peek_key = reader.peek_key()
             if peek_key is None or peek_key == cls.END_OF_FILE:
                 break
-            if peek_key.startswith(cls.HEADER_PREFIX):
-                continue
-            next_snapshot = reader.next_snapshot()
-            result.snapshots = result.snapshots.plus(peek_key, next_snapshot)
+            snapshots.append((peek_key, reader.next_snapshot()))
+        result.snapshots = PersistentSortedMap.of(snapshots)
+        return result
+
+    @classmethod
+    def parse_binary(
+        cls,
+        content: Union[bytes, mmap.mmap],
+        lazy: bool = False,
+        entries: Optional[Iterable[SnapshotEntry]] = None,
+    ) -> "SnapshotFile":
+        """
+        Same result as `parse(SnapshotValueReader.of_binary(content))`, but reads the whole content in one pass.
 
+        If `lazy`, only the headers are parsed up front, and each snapshot is decoded the first time it is used.
+        If `entries` were already scanned from this exact content, they are used instead of scanning it again.
+        """
+        scanner = SnapshotFileScanner(content)
+        result = cls()
+        result.unix_newlines = scanner.unix_newlines
+
+        entries = iter(entries) if entries is not None else scanner.entries()
+        entry = next(entries, None)
+        if entry is not None and entry.key.startswith(cls.HEADER_PREFIX):
+            metadata_name = entry.key[len(cls.HEADER_PREFIX) :]
+            result.metadata = (metadata_name, scanner.value(entry).value_string())
+            entry = next(entries, None)
+
+        snapshots: list[tuple[str, Snapshot]] = []
+        while entry is not None:
+            group = [entry]
+            builder = None if lazy else Snapshot.builder(scanner.value(entry))
+            entry = next(entries, None)
+            while entry is not None:
+                facet_idx = entry.key.find("[")
+                if facet_idx == -1 or entry.key[:facet_idx] != group[0].key:
+                    break
+                group.append(entry)
+                if builder is not None:
+                    facet_name = entry.key[facet_idx + 1 : -1]
+                    builder.plus_facet(facet_name, scanner.value(entry))
+                entry = next(entries, None)
+            snapshot = (
+                builder.build()
+                if builder is not None
+                else _LazySnapshot(scanner, group)
+            )
+            snapshots.append((group[0].key, snapshot))
+        result.snapshots = PersistentSortedMap.of(snapshots)
+
+        if lazy:
+            result._scanner = scanner  # noqa: SLF001
         return result
 
+    @classmethod
+    def map_file(
+        cls,
+        path: str,
+        in_memory: bool = False,
+        scan: Optional[
+            Callable[[Union[bytes, mmap.mmap]], Iterable[SnapshotEntry]]
+        ] = None,
+    ) -> "SnapshotFile":
+        """
+        Memory-maps the file at `path` and parses it lazily, see `parse_binary`.
+
+        If `in_memory`, the file is read into memory instead, so that no file handle is kept open.
+        If `scan` is given, it finds the entries of the content instead of `SnapshotFileScanner`,
+        e.g. to load them from a cache.
+        """
+        with open(path, "rb") as file:
+            if in_memory:
+                content = file.read()
+            else:
+                try:
+                    content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # empty files can't be mapped
+                    content = b""
+        entries = scan(content) if scan is not None else None
+        result = cls.parse_binary(content, lazy=True, entries=entries)
+        result._mapped_path = path  # noqa: SLF001
+        return result
+
+    def close(self) -> None:
+        """Releases the file this was mapped from, so that it can be replaced or deleted."""
+        with self._lock:
+            if self._scanner is not None:
+                self._scanner.close()
+
     @classmethod
     def create_empty_with_unix_newlines(cls, unix_newlines: bool) -> "SnapshotFile":
         result = cls()
         result.unix_newlines = unix_newlines
         return result
+
+
+def _load_snapshot(
+    scanner: SnapshotFileScanner, group: list[SnapshotEntry]
+) -> Snapshot:
+    root = group[0]
+    snapshot = Snapshot.builder(scanner.value(root))
+    for facet in group[1:]:
+        facet_name = facet.key[len(root.key) + 1 : -1]
+        snapshot.plus_facet(facet_name, scanner.value(facet))
+    return snapshot.build()
+
+
+class _LazySnapshot(Snapshot):
+    """A `Snapshot` which is decoded from its byte range in the file the first time it is used."""
+
+    __slots__ = ("__group", "__loaded", "__scanner")
+
+    def __init__(self, scanner: SnapshotFileScanner, group: list[SnapshotEntry]):
+        self.__scanner = scanner
+        self.__group = group
+        self.__loaded: Optional[Snapshot] = None
+        self._hash = None
+
+    def load(self) -> Snapshot:
+        loaded = self.__loaded
+        if loaded is None:
+            loaded = _load_snapshot(self.__scanner, self.__group)
+            self.__loaded = loaded
+        return loaded
+
+    def raw_bytes_in(self, scanner: SnapshotFileScanner) -> Optional[bytes]:
+        """The lines this snapshot and its facets were parsed from, if they came from `scanner`."""
+        if scanner is not self.__scanner:
+            return None
+        content = scanner.content
+        start = self.__group[0].header_start
+        last = self.__group[-1]
+        if last.value_end < len(content):
+            # include the newline which ends the value
+            return content[start : last.value_end + 1]
+        elif last.value_start == last.value_end and content[last.value_end - 1] == 10:
+            # a header without a value at the very end, its newline is already included
+            return content[start : last.value_end]
+        else:
+            newline = b"\n" if scanner.unix_newlines else b"\r\n"
+            return content[start : last.value_end] + newline
+
+    @property
+    def _subject(self) -> SnapshotValue:  # type: ignore[override]
+        return self.load().subject
+
+    @property
+    def _facet_data(self) -> ArrayMap[str, SnapshotValue]:  # type: ignore[override]
+        return self.load().facets
@@ -0,0 +1,91 @@
+import base64
+import mmap
+import re
+from collections.abc import Iterator
+from typing import NamedTuple, Union
+
+from .SnapshotValue import SnapshotValue
+from .SnapshotValueReader import SnapshotValueReader, _parse_key
+
+_NEWLINE_KEY_FIRST_CHAR = b"\n" + SnapshotValueReader.KEY_FIRST_CHAR.encode("utf-8")
+_CARRIAGE_RETURNS_BEFORE_NEWLINE = re.compile("\r+\n")
+
+
+class SnapshotEntry(NamedTuple):
+    key: str
+    is_base64: bool
+    header_start: int
+    value_start: int
+    value_end: int
+
+
+class SnapshotFileScanner:
+    """
+    Reads the entries of a `.ss` file straight from its bytes, without going line by line.
+
+    Produces exactly the same keys and values as `SnapshotValueReader`, and raises
+    `ParseException` with the same line numbers. Every entry knows the byte range of its
+    value, which is only decoded and unescaped by `value(entry)`.
+    """
+
+    def __init__(self, content: Union[bytes, mmap.mmap]):
+        self.content = content
+        first_newline = content.find(b"\n")
+        self.unix_newlines = first_newline <= 0 or content[first_newline - 1] != 13
+
+    def entries(self) -> Iterator[SnapshotEntry]:
+        """Every entry in the file, stopping before the `[end of file]` marker."""
+        content = self.content
+        length = len(content)
+        line_start = 0
+        while line_start < length:
+            line_end = content.find(b"\n", line_start)
+            if line_end == -1:
+                line_end = length
+            is_base64, key = self.__parse_header(line_start, line_end)
+            if key == "[end of file]":
+                return
+            next_header = content.find(_NEWLINE_KEY_FIRST_CHAR, line_end)
+            if next_header == -1:
+                # the last value, its final newline isn't part of it
+                value_end = length
+                if value_end > line_end + 1 and content[value_end - 1] == 10:
+                    value_end -= 1
+                next_line_start = length
+            else:
+                value_end = next_header
+                next_line_start = next_header + 1
+            yield SnapshotEntry(
+                key, is_base64, line_start, min(line_end + 1, value_end), value_end
+            )
+            line_start = next_line_start
+
+    def value(self, entry: SnapshotEntry) -> SnapshotValue:
+        raw_string = self.__decode(entry.value_start, entry.value_end)
+        if entry.is_base64:
+            return SnapshotValue.of(base64.b64decode(raw_string))
+        else:
+            return SnapshotValue.of(SnapshotValueReader.body_esc.unescape(raw_string))
+
+    def close(self) -> None:
+        """If the content is memory-mapped, copies it into memory and unmaps it."""
+        if isinstance(self.content, mmap.mmap):
+            mapped = self.content
+            self.content = mapped[:]
+            mapped.close()
+
+    def line_number(self, offset: int) -> int:
+        """The one-indexed line number of the given byte offset."""
+        return bytes(self.content[:offset]).count(b"\n") + 1
+
+    def __parse_header(self, line_start: int, line_end: int) -> tuple[bool, str]:
+        line = self.__decode(line_start, line_end)
+        key = _parse_key(line, lambda: self.line_number(line_start))
+        return (SnapshotValueReader.FLAG_BASE64 in line, key)
+
+    def __decode(self, start: int, end: int) -> str:
+        text = self.content[start:end].decode("utf-8")
+        if not self.unix_newlines and "\r" in text:
+            # windows newlines are `\r\n`, but every trailing `\r` of a line is stripped
+            text = _CARRIAGE_RETURNS_BEFORE_NEWLINE.sub("\n", text).rstrip("\r")
+        return text
@@ -16,7 +16,7 @@ class SnapshotReader:
 
     def next_snapshot(self) -> Snapshot:
         root_name: Optional[str] = self.peek_key()
-        snapshot: Snapshot = Snapshot.of(self.value_reader.next_value())
+        snapshot = Snapshot.builder(self.value_reader.next_value())
         while True:
             next_key: Optional[str] = self.value_reader.peek_key()
             if next_key is None or next_key == "[end of file]":
@@ -31,10 +31,10 @@ class SnapshotReader:
                 )
                 if facet_root == root_name:
                     facet_value = self.value_reader.next_value()
-                    snapshot = snapshot.plus_facet(facet_name, facet_value)
+                    snapshot.plus_facet(facet_name, facet_value)
                 else:
                     break
-        return snapshot
+        return snapshot.build()
 
     def skip_snapshot(self) -> None:
         root_name: Optional[str] = self.peek_key()
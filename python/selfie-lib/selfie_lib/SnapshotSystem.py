@@ -3,10 +3,13 @@ from collections.abc import ByteString
 from enum import Enum, auto
 from typing import Optional
 
+from .BinaryDiff import BinaryDiff
 from .CommentTracker import CommentTracker
 from .FS import FS
 from .Literals import LiteralValue
 from .Snapshot import Snapshot
+from .SnapshotValue import SnapshotValue
+from .TextDiff import TextDiff
 from .TypedPath import TypedPath
 from .WriteTracker import CallStack, SnapshotFileLayout
 
@@ -124,26 +127,51 @@ class Mode(Enum):
     def msg_snapshot_not_found_no_such_file(self, file) -> str:
         return self.msg(f"Snapshot not found: no such file {file}")
 
-    def msg_snapshot_mismatch(self, expected: str, actual: str) -> str:  # noqa: ARG002
-        return self.msg(
-            "Snapshot mismatch (error msg could be better https://github.com/diffplug/selfie/issues/501)"
-        )
+    def msg_snapshot_mismatch(self, expected: str, actual: str) -> str:
+        return f"{self.msg('Snapshot mismatch')}\n{TextDiff.of(expected, actual)}"
+
+    def msg_snapshot_mismatch_facets(
+        self, expected: Snapshot, actual: Snapshot, keys: list[str]
+    ) -> str:
+        pieces = [self.msg("Snapshot mismatch")]
+        for key in keys:
+            pieces.append(f"facet `{key}`" if key else "subject")
+            expected_value = expected.subject_or_facet_maybe(key)
+            actual_value = actual.subject_or_facet_maybe(key)
+            if expected_value is None:
+                pieces.append("missing from the expected snapshot")
+            elif actual_value is None:
+                pieces.append("missing from the actual snapshot")
+            elif expected_value.is_binary and actual_value.is_binary:
+                pieces.append(
+                    str(
+                        BinaryDiff.of(
+                            expected_value.value_binary(), actual_value.value_binary()
+                        )
+                    )
+                )
+            elif expected_value.is_binary or actual_value.is_binary:
+                pieces.append(
+                    f"expected {self.__describe(expected_value)}, actual {self.__describe(actual_value)}"
+                )
+            else:
+                pieces.append(
+                    str(
+                        TextDiff.of(
+                            expected_value.value_string(), actual_value.value_string()
+                        )
+                    )
+                )
+        return "\n".join(pieces)
 
-    def msg_snapshot_mismatch_binary(self, expected: bytes, actual: bytes) -> str:
-        return self.msg_snapshot_mismatch(
-            self._to_quoted_printable(expected), self._to_quoted_printable(actual)
-        )
+    @staticmethod
+    def __describe(value: SnapshotValue) -> str:
+        if value.is_binary:
+            return f"{len(value.value_binary())} bytes of binary"
+        return f"{len(value.value_string())} characters of text"
 
-    def _to_quoted_printable(self, byte_data: bytes) -> str:
-        result = []
-        for b in byte_data:
-            # b is already an integer in [0..255] when iterating through a bytes object
-            if 33 <= b <= 126 and b != 61:  # '=' is ASCII 61, so skip it
-                result.append(chr(b))
-            else:
-                # Convert to uppercase hex, pad to 2 digits, and prepend '='
-                result.append(f"={b:02X}")
-        return "".join(result)
+    def msg_snapshot_mismatch_binary(self, expected: bytes, actual: bytes) -> str:
+        return f"{self.msg('Snapshot mismatch')}\n{BinaryDiff.of(expected, actual)}"
 
     def msg(self, headline: str) -> str:
         if self == Mode.interactive:
@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Union
+from typing import Optional, Union
 
 from .LineReader import _to_unix
 
 
 class SnapshotValue(ABC):
+    __slots__ = ()
+
     @property
     def is_binary(self) -> bool:
         return isinstance(self, SnapshotValueBinary)
@@ -30,8 +32,11 @@ class SnapshotValue(ABC):
 
 
 class SnapshotValueBinary(SnapshotValue):
+    __slots__ = ("_hash", "_value")
+
     def __init__(self, value: bytes):
-        self._value = value
+        self._value: bytes = value
+        self._hash: Optional[int] = None
 
     def value_binary(self) -> bytes:
         return self._value
@@ -40,17 +45,29 @@ class SnapshotValueBinary(SnapshotValue):
         raise NotImplementedError("This is a binary value.")
 
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, SnapshotValueBinary):
-            return self.value_binary() == other.value_binary()
-        return False
+        if not isinstance(other, SnapshotValueBinary):
+            return False
+        if self is other:
+            return True
+        # only compare hashes which are already cached, computing one costs a full pass
+        my_hash, their_hash = self._hash, other._hash
+        if my_hash is not None and their_hash is not None and my_hash != their_hash:
+            return False
+        return self._value == other._value
 
     def __hash__(self) -> int:
-        return hash(self._value)
+        cached = self._hash
+        if cached is None:
+            cached = hash(self._value)
+            self._hash = cached
+        return cached
 
 
 class SnapshotValueString(SnapshotValue):
+    __slots__ = ("_value",)
+
     def __init__(self, value: str):
-        self._value = value
+        self._value: str = value
 
     def value_binary(self) -> bytes:
         raise NotImplementedError("This is a string value.")
@@ -60,8 +77,9 @@ class SnapshotValueString(SnapshotValue):
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, SnapshotValueString):
-            return self.value_string() == other.value_string()
+            return self is other or self._value == other._value
         return False
 
     def __hash__(self) -> int:
+        # `str` caches its own hash
         return hash(self._value)
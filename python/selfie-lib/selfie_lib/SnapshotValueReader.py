@@ -74,23 +74,7 @@ class SnapshotValueReader:
         line: Optional[str] = self.__next_line()
         if line is None:
             return None
-        start_index: int = line.find(self.KEY_START)
-        end_index: int = line.find(self.KEY_END)
-        if start_index == -1:
-            raise ParseException(
-                self.line_reader, f"Expected to start with '{self.KEY_START}'"
-            )
-        if end_index == -1:
-            raise ParseException(
-                self.line_reader, f"Expected to contain '{self.KEY_END}'"
-            )
-        key: str = line[start_index + len(self.KEY_START) : end_index]
-        if key.startswith(" ") or key.endswith(" "):
-            space_type = "Leading" if key.startswith(" ") else "Trailing"
-            raise ParseException(
-                self.line_reader, f"{space_type} spaces are disallowed: '{key}'"
-            )
-        return self.name_esc.unescape(key)
+        return _parse_key(line, self.line_reader.get_line_number)
 
     def __next_line(self) -> Optional[str]:
         if self.line is None:
@@ -107,3 +91,24 @@ class SnapshotValueReader:
     @classmethod
     def of_binary(cls, content: bytes) -> "SnapshotValueReader":
         return cls(LineReader.for_binary(content))
+
+
+def _parse_key(line: str, line_number: Callable[[], int]) -> str:
+    start_index: int = line.find(SnapshotValueReader.KEY_START)
+    end_index: int = line.find(SnapshotValueReader.KEY_END)
+    if start_index == -1:
+        raise ParseException(
+            line_number(),
+            f"Expected to start with '{SnapshotValueReader.KEY_START}'",
+        )
+    if end_index == -1:
+        raise ParseException(
+            line_number(), f"Expected to contain '{SnapshotValueReader.KEY_END}'"
+        )
+    key: str = line[start_index + len(SnapshotValueReader.KEY_START) : end_index]
+    if key.startswith(" ") or key.endswith(" "):
+        space_type = "Leading" if key.startswith(" ") else "Trailing"
+        raise ParseException(
+            line_number(), f"{space_type} spaces are disallowed: '{key}'"
+        )
+    return SnapshotValueReader.name_esc.unescape(key)
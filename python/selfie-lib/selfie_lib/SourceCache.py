@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from .FS import FS
+from .SourceFile import SourceFile
+from .TypedPath import TypedPath
+
+
+def _read(path: TypedPath, fs: Optional[FS]) -> str:
+    if fs is not None:
+        return fs.file_read(path)
+    return Path(path.absolute_path).read_bytes().decode()
+
+
+class _Entry:
+    __slots__ = ("mtime_ns", "size", "source", "text")
+
+    def __init__(self, mtime_ns: int, size: int, text: str):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.text = text
+        self.source: Optional[SourceFile] = None
+
+
+class SourceCache:
+    """
+    The text of source files and their parsed `SourceFile`, shared by everything in the process which
+    reads them. An entry is valid while the file's `(st_mtime_ns, st_size)` is unchanged, and writing
+    through `write` drops it.
+    """
+
+    __SHARED: "SourceCache"
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__entries: dict[TypedPath, _Entry] = {}
+
+    @classmethod
+    def shared(cls) -> "SourceCache":
+        try:
+            return cls.__SHARED
+        except AttributeError:
+            cls.__SHARED = SourceCache()
+            return cls.__SHARED
+
+    def __entry(self, path: TypedPath, fs: Optional[FS]) -> Optional[_Entry]:
+        try:
+            stat = os.stat(path.absolute_path)
+        except OSError:
+            # not a real file, so there's nothing to validate an entry against
+            return None
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if (
+                entry is not None
+                and entry.mtime_ns == stat.st_mtime_ns
+                and entry.size == stat.st_size
+            ):
+                return entry
+        entry = _Entry(stat.st_mtime_ns, stat.st_size, _read(path, fs))
+        with self.__lock:
+            self.__entries[path] = entry
+        return entry
+
+    def read(self, path: TypedPath, fs: Optional[FS] = None) -> str:
+        entry = self.__entry(path, fs)
+        return _read(path, fs) if entry is None else entry.text
+
+    def source_file(self, path: TypedPath, fs: Optional[FS] = None) -> SourceFile:
+        """A `SourceFile` of `path` whose edits are its own, the parsing is shared with other callers."""
+        entry = self.__entry(path, fs)
+        if entry is None:
+            return SourceFile(path.name, _read(path, fs))
+        source = entry.source
+        if source is None:
+            source = SourceFile(path.name, entry.text)
+            entry.source = source
+        return source.copy()
+
+    def write(self, path: TypedPath, content: str, fs: FS) -> None:
+        self.invalidate(path)
+        fs.file_write(path, content)
+        # also drops anything read while the write was in progress
+        self.invalidate(path)
+
+    def invalidate(self, path: TypedPath) -> None:
+        with self.__lock:
+            self.__entries.pop(path, None)
@@ -1,3 +1,6 @@
+import copy
+import re
+from bisect import bisect_left
 from typing import Any
 
 from .EscapeLeadingWhitespace import EscapeLeadingWhitespace
@@ -10,7 +13,7 @@ class SourceFile:
 
     def __init__(self, filename: str, content: str) -> None:
         self.__unix_newlines: bool = "\r" not in content
-        self._content_slice: Slice = Slice(content.replace("\r\n", "\n"))
+        self._set_content(content.replace("\r\n", "\n"))
         self.__language: Language = Language.from_filename(filename)
         self.__escape_leading_whitespace = EscapeLeadingWhitespace.appropriate_for(
             self._content_slice.__str__()
@@ -18,7 +21,7 @@ class SourceFile:
 
     def remove_selfie_once_comments(self):
         # Split content into lines
-        lines = self._content_slice.__str__().split("\n")
+        lines = self.__materialize().split("\n")
 
         # Create a new list of lines, excluding lines containing '# selfieonce' or '#selfieonce'
         new_lines = []
@@ -40,18 +43,78 @@ class SourceFile:
         new_content = "\n".join(new_lines)
 
         # Update the content slice with new content
-        self._content_slice = Slice(new_content)
+        self._set_content(new_content)
 
         if not self.__unix_newlines:
-            self._content_slice = Slice(new_content.replace("\n", "\r\n"))
+            self._set_content(new_content.replace("\n", "\r\n"))
+
+    def copy(self) -> "SourceFile":
+        """A copy which shares the parsed content, but whose edits are its own."""
+        result = copy.copy(self)
+        result.__edits = list(self.__edits)  # noqa: SLF001
+        result.__edit_starts = list(self.__edit_starts)  # noqa: SLF001
+        return result
+
+    def _set_content(self, content: str) -> None:
+        self._content_slice: Slice = Slice(content)
+        # the offset of every newline, so that lines are found with a lookup instead of a scan
+        self.__newlines: list[int] = [
+            match.start() for match in _NEWLINE.finditer(content)
+        ]
+        # pending edits as (start, end, replacement), sorted and against the offsets of `content`
+        self.__edits: list[tuple[int, int, str]] = []
+        self.__edit_starts: list[int] = []
+
+    def _replace(self, start: int, end: int, replacement: str) -> None:
+        """
+        Records that the content from `start` to `end` is replaced. Offsets and line numbers
+        always refer to the content before any edits, which `as_string` applies without
+        changing that content.
+        """
+        index = bisect_left(self.__edit_starts, start)
+        if (index > 0 and self.__edits[index - 1][1] > start) or (
+            index < len(self.__edits) and self.__edits[index][0] < end
+        ):
+            raise ValueError(
+                f"Edit of line {self._line_at_offset(start)} overlaps an earlier edit"
+            )
+        self.__edits.insert(index, (start, end, replacement))
+        self.__edit_starts.insert(index, start)
+
+    def __materialize(self) -> str:
+        content = self._content_slice.base
+        if not self.__edits:
+            return content
+        pieces = []
+        position = 0
+        for start, end, replacement in self.__edits:
+            pieces.append(content[position:start])
+            pieces.append(replacement)
+            position = end
+        pieces.append(content[position:])
+        return "".join(pieces)
+
+    def _line(self, line_one_indexed: int) -> Slice:
+        assert line_one_indexed > 0, "Count must be positive"
+        newlines = self.__newlines
+        assert (
+            line_one_indexed <= len(newlines) + 1
+        ), f"This string has only {len(newlines) + 1} lines, not {line_one_indexed}"
+        start = 0 if line_one_indexed == 1 else newlines[line_one_indexed - 2] + 1
+        end = (
+            newlines[line_one_indexed - 1]
+            if line_one_indexed <= len(newlines)
+            else len(self._content_slice)
+        )
+        return self._content_slice.subSequence(start, end)
+
+    def _line_at_offset(self, offset: int) -> int:
+        return bisect_left(self.__newlines, offset) + 1
 
     @property
     def as_string(self) -> str:
-        return (
-            self._content_slice.__str__()
-            if self.__unix_newlines
-            else self._content_slice.__str__().replace("\n", "\r\n")
-        )
+        content = self.__materialize()
+        return content if self.__unix_newlines else content.replace("\n", "\r\n")
 
     class ToBeLiteral:
         def __init__(
@@ -76,7 +139,7 @@ class SourceFile:
         def _get_arg(self):
             return self.__arg
 
-        def set_literal_and_get_newline_delta(self, literal_value: LiteralValue) -> int:
+        def set_literal(self, literal_value: LiteralValue) -> None:
             encoded = literal_value.format.encode(
                 literal_value.actual,
                 self.__language,
@@ -97,21 +160,17 @@ class SourceFile:
                         f"ENCODED ORIGINAL\n{encoded}\n"
                         f"```\n"
                     )
-            existing_newlines = self.__function_call_plus_arg.count("\n")
-            new_newlines = encoded.count("\n")
-            self.__parent._content_slice = Slice(  # noqa: SLF001
-                self.__function_call_plus_arg.replaceSelfWith(
-                    f"{self.__dot_fun_open_paren}{encoded})"
-                )
+            self.__parent._replace(
+                self.__function_call_plus_arg.startIndex,
+                self.__function_call_plus_arg.endIndex,
+                f"{self.__dot_fun_open_paren}{encoded})",
             )
 
-            return new_newlines - existing_newlines
-
         def parse_literal(self, literal_format: LiteralFormat) -> Any:
             return literal_format.parse(self.__arg.__str__(), self.__language)
 
     def find_on_line(self, to_find: str, line_one_indexed: int) -> Slice:
-        line_content = self._content_slice.unixLine(line_one_indexed)
+        line_content = self._line(line_one_indexed)
         idx = line_content.indexOf(to_find)
         if idx == -1:
             raise AssertionError(
@@ -124,10 +183,10 @@ class SourceFile:
         assert "\n" not in replace
 
         found = self.find_on_line(find, line_one_indexed)
-        self._content_slice = Slice(found.replaceSelfWith(replace))
+        self._replace(found.startIndex, found.endIndex, replace)
 
     def parse_to_be_like(self, line_one_indexed: int) -> ToBeLiteral:
-        line_content = self._content_slice.unixLine(line_one_indexed)
+        line_content = self._line(line_one_indexed)
         dot_fun_open_paren = None
 
         for to_be_like in TO_BE_LIKES:
@@ -256,7 +315,7 @@ class SourceFile:
                     f"Non-primitive literal in `{dot_fun_open_paren}` starting at "
                     f"line {line_one_indexed}: error for character "
                     f"`{self._content_slice[end_paren]}` on line "
-                    f"{self._content_slice.baseLineAtOffset(end_paren)}"
+                    f"{self._line_at_offset(end_paren)}"
                 )
             end_paren += 1
             if end_paren == self._content_slice.__len__():
@@ -267,6 +326,8 @@ class SourceFile:
         return (end_paren, end_arg)
 
 
+_NEWLINE = re.compile("\n")
+
 TO_BE_LIKES = [
     ".to_be(",
     ".to_be_TODO(",
@@ -0,0 +1,288 @@
+import time
+from typing import Optional, Union
+
+# how many lines of each side are diffed, and how many edits and seconds that may take
+_WINDOW_LINES = 2000
+_MAX_EDITS = 500
+_TIME_BUDGET = 0.05
+
+# how many characters are compared at once while looking for the first difference
+_FIRST_CHUNK = 4096
+_MAX_CHUNK = 1 << 20
+
+
+def _matches(a: Union[str, bytes], b: Union[str, bytes]):
+    """Whether `length` items of `a` at `a_start` equal those of `b` at `b_start`, copying only from `b`."""
+    # `startswith` accepts any buffer, so bytes are compared without copying either side
+    other = memoryview(b) if isinstance(b, bytes) else b
+
+    def matches(a_start: int, b_start: int, length: int) -> bool:
+        return a.startswith(other[b_start : b_start + length], a_start)  # type: ignore[arg-type]
+
+    return matches
+
+
+def _common_prefix_length(a: Union[str, bytes], b: Union[str, bytes]) -> int:
+    """The length of the common prefix of `a` and `b`, found by comparing chunks natively."""
+    matches = _matches(a, b)
+    n = min(len(a), len(b))
+    start = 0
+    chunk = _FIRST_CHUNK
+    while start < n:
+        length = min(chunk, n - start)
+        if not matches(start, start, length):
+            # binary search for the first difference, the prefix up to `low` is always equal
+            low, high = start, start + length
+            while high - low > 1:
+                mid = (low + high) // 2
+                if matches(low, low, mid - low):
+                    low = mid
+                else:
+                    high = mid
+            return low
+        start += length
+        chunk = min(chunk * 2, _MAX_CHUNK)
+    return n
+
+
+def _common_suffix_length(
+    a: Union[str, bytes], b: Union[str, bytes], limit: int
+) -> int:
+    """The length of the common suffix of `a` and `b`, but no more than `limit`."""
+    matches = _matches(a, b)
+    len_a, len_b = len(a), len(b)
+    start = 0
+    chunk = _FIRST_CHUNK
+    while start < limit:
+        end = min(start + chunk, limit)
+        if not matches(len_a - end, len_b - end, end - start):
+            low, high = start, end
+            while high - low > 1:
+                mid = (low + high) // 2
+                if matches(len_a - mid, len_b - mid, mid - low):
+                    low = mid
+                else:
+                    high = mid
+            return low
+        start = end
+        chunk = min(chunk * 2, _MAX_CHUNK)
+    return limit
+
+
+def _window(text: str, start: int, end: int) -> tuple[list[str], bool]:
+    """The first lines of `text[start:end]` with their newlines, and whether that is all of them."""
+    lines = []
+    pos = start
+    while pos < end and len(lines) < _WINDOW_LINES:
+        newline = text.find("\n", pos, end)
+        line_end = end if newline == -1 else newline + 1
+        lines.append(text[pos:line_end])
+        pos = line_end
+    return lines, pos >= end
+
+
+def _myers(
+    a: list[str], b: list[str], deadline: float
+) -> Optional[list[tuple[str, str]]]:
+    """The shortest edit script from `a` to `b`, or None if it takes too many edits or too long."""
+    n, m = len(a), len(b)
+    max_d = min(n + m, _MAX_EDITS)
+    offset = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+    for d in range(max_d + 1):
+        if time.perf_counter() > deadline:
+            return None
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(a, b, trace, offset)
+    return None
+
+
+def _backtrack(
+    a: list[str], b: list[str], trace: list[list[int]], offset: int
+) -> list[tuple[str, str]]:
+    x, y = len(a), len(b)
+    ops = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            ops.append(("=", a[x - 1]))
+            x -= 1
+            y -= 1
+        if d > 0:
+            if x == prev_x:
+                ops.append(("+", b[y - 1]))
+            else:
+                ops.append(("-", a[x - 1]))
+        x, y = prev_x, prev_y
+    ops.reverse()
+    return ops
+
+
+class TextDiff:
+    """
+    A unified diff of two strings, computed within a fixed budget so that it stays fast for huge ones.
+
+    The common lines at the start and end are skipped with native string comparisons, and only
+    a window of the lines in between is diffed with Myers' algorithm. If that takes too many
+    edits or too long, the window is reported as replaced.
+    """
+
+    __slots__ = ("_lines", "first_column", "first_line")
+
+    def __init__(
+        self, first_line: Optional[int], first_column: Optional[int], lines: list[str]
+    ):
+        self.first_line = first_line
+        self.first_column = first_column
+        self._lines = lines
+
+    @staticmethod
+    def of(
+        expected: str,
+        actual: str,
+        context: int = 3,
+        max_lines: int = 60,
+        max_line_length: int = 160,
+    ) -> "TextDiff":
+        prefix = _common_prefix_length(expected, actual)
+        if prefix == len(expected) == len(actual):
+            return TextDiff(None, None, [])
+        start = expected.rfind("\n", 0, prefix) + 1
+        first_line = expected.count("\n", 0, start) + 1
+        lines = [f"first difference at line {first_line}, column {prefix - start + 1}"]
+
+        line_end = expected.find("\n", start)
+        if (line_end if line_end != -1 else len(expected)) - start > max_line_length:
+            # a long line, so show where it differs rather than where it starts
+            width = max_line_length // 2
+            lines.append(
+                f"expected: …{expected[max(prefix - width, 0) : prefix + width]!r}…"
+            )
+            lines.append(
+                f"  actual: …{actual[max(prefix - width, 0) : prefix + width]!r}…"
+            )
+
+        # the common suffix, rounded to whole lines on both sides
+        suffix = _common_suffix_length(
+            expected, actual, min(len(expected), len(actual)) - start
+        )
+        tail = len(expected) - suffix
+        actual_tail = len(actual) - suffix
+        if (tail > start and expected[tail - 1] != "\n") or (
+            actual_tail > start and actual[actual_tail - 1] != "\n"
+        ):
+            newline = expected.find("\n", tail)
+            tail = len(expected) if newline == -1 else newline + 1
+            actual_tail = len(actual) - (len(expected) - tail)
+
+        expected_lines, expected_complete = _window(expected, start, tail)
+        actual_lines, actual_complete = _window(actual, start, actual_tail)
+        complete = expected_complete and actual_complete
+        ops = _myers(expected_lines, actual_lines, time.perf_counter() + _TIME_BUDGET)
+        if ops is None:
+            # too different to diff within budget, so show the start of both sides
+            half = max_lines // 2
+            complete = complete and len(expected_lines) <= half >= len(actual_lines)
+            ops = [("-", line) for line in expected_lines[:half]]
+            ops.extend(("+", line) for line in actual_lines[:half])
+        elif not complete:
+            # the end of a window is diffed against lines which may match further on
+            last_equal = max(
+                (i for i, (tag, _) in enumerate(ops) if tag == "="), default=None
+            )
+            if last_equal is not None and any(
+                tag != "=" for tag, _ in ops[:last_equal]
+            ):
+                ops = ops[: last_equal + 1]
+
+        before = []
+        pos = start
+        while pos > 0 and len(before) < context:
+            line_start = expected.rfind("\n", 0, pos - 1) + 1
+            before.append(expected[line_start:pos])
+            pos = line_start
+        before.reverse()
+        ops = [("=", line) for line in before] + ops
+        if complete:
+            after, _ = _window(expected, tail, min(len(expected), tail + 4096))
+            ops.extend(("=", line) for line in after[:context])
+
+        lines.extend(_unified(ops, first_line - len(before), context, max_line_length))
+        if len(lines) > max_lines:
+            lines = lines[:max_lines]
+            lines.append("... (diff truncated)")
+        elif not complete:
+            lines.append(
+                f"... (diff truncated, only {_WINDOW_LINES} lines from the first difference were compared)"
+            )
+        return TextDiff(first_line, prefix - start + 1, lines)
+
+    def __bool__(self) -> bool:
+        return self.first_line is not None
+
+    def __str__(self) -> str:
+        return "\n".join(self._lines)
+
+
+def _unified(
+    ops: list[tuple[str, str]],
+    line_number: int,
+    context: int,
+    max_line_length: int,
+) -> list[str]:
+    """Renders an edit script as the hunks of a unified diff."""
+    # the line numbers before each op
+    expected_numbers, actual_numbers = [], []
+    expected_number = actual_number = line_number
+    for tag, _ in ops:
+        expected_numbers.append(expected_number)
+        actual_numbers.append(actual_number)
+        if tag != "+":
+            expected_number += 1
+        if tag != "-":
+            actual_number += 1
+
+    changes = [i for i, (tag, _) in enumerate(ops) if tag != "="]
+    groups: list[list[int]] = []
+    for i in changes:
+        if groups and i - groups[-1][-1] <= 2 * context + 1:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+
+    result = []
+    for group in groups:
+        first = max(group[0] - context, 0)
+        last = min(group[-1] + context + 1, len(ops))
+        hunk = ops[first:last]
+        result.append(
+            f"@@ -{expected_numbers[first]},{sum(tag != '+' for tag, _ in hunk)}"
+            f" +{actual_numbers[first]},{sum(tag != '-' for tag, _ in hunk)} @@"
+        )
+        for tag, line in hunk:
+            text = line.removesuffix("\n")
+            if len(text) > max_line_length:
+                text = f"{text[:max_line_length]}… ({len(text)} characters)"
+            result.append((" " if tag == "=" else tag) + text)
+            if not line.endswith("\n"):
+                result.append("\\ No newline at end")
+    return result
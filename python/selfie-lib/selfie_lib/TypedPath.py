@@ -1,10 +1,13 @@
+import sys
 from functools import total_ordering
 
 
 @total_ordering
 class TypedPath:
+    __slots__ = ("absolute_path",)
+
     def __init__(self, absolute_path: str):
-        self.absolute_path = absolute_path
+        self.absolute_path = sys.intern(absolute_path)
 
     def __hash__(self):
         return hash(self.absolute_path)
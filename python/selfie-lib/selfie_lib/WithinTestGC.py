@@ -1,91 +1,106 @@
 from collections.abc import Iterable
 from threading import Lock
+from typing import Optional, Union, cast
 
 from .ArrayMap import ArrayMap, ArraySet
+from .PersistentSortedMap import PersistentSortedMap
 from .Snapshot import Snapshot
 
 
 class WithinTestGC:
     def __init__(self):
-        self.suffixes_to_keep = ArraySet.empty()
+        self.__suffixes_to_keep: Optional[ArraySet[str]] = ArraySet.empty()
+        # suffixes kept while the test runs, which `finish` sorts into `suffixes_to_keep` all at once
+        self.__pending: set[str] = set()
         self.lock = Lock()
 
     def keep_suffix(self, suffix: str):
         with self.lock:
-            if self.suffixes_to_keep:
-                self.suffixes_to_keep = self.suffixes_to_keep.plusOrThis(suffix)
+            if self.__suffixes_to_keep is not None:
+                self.__pending.add(suffix)
 
     def keep_all(self) -> "WithinTestGC":
         with self.lock:
-            self.suffixes_to_keep = None
+            self.__suffixes_to_keep = None
+            self.__pending.clear()
         return self
 
+    def finish(self) -> None:
+        """Called when the test finishes, to sort the suffixes it kept."""
+        with self.lock:
+            self.__finish()
+
+    def __finish(self) -> None:
+        if self.__pending:
+            self.__suffixes_to_keep = self.__suffixes_to_keep.union(  # type: ignore
+                ArraySet.of(self.__pending)
+            )
+            self.__pending.clear()
+
+    @property
+    def suffixes_to_keep(self) -> Optional[ArraySet[str]]:
+        with self.lock:
+            self.__finish()
+            return self.__suffixes_to_keep
+
     def __str__(self) -> str:
+        suffixes_to_keep = self.suffixes_to_keep
+        return str(suffixes_to_keep) if suffixes_to_keep is not None else "(null)"
+
+    def succeeded_and_used_no_snapshots(self) -> bool:
         with self.lock:
             return (
-                str(self.suffixes_to_keep)
-                if self.suffixes_to_keep is not None
-                else "(null)"
+                self.__suffixes_to_keep is not None
+                and not self.__suffixes_to_keep
+                and not self.__pending
             )
 
-    def succeeded_and_used_no_snapshots(self) -> bool:
+    def keeps_all(self) -> bool:
         with self.lock:
-            return self.suffixes_to_keep == ArraySet.empty()
+            return self.__suffixes_to_keep is None
 
     def keeps(self, s: str) -> bool:
         with self.lock:
-            return True if self.suffixes_to_keep is None else s in self.suffixes_to_keep
+            return (
+                self.__suffixes_to_keep is None
+                or s in self.__pending
+                or s in self.__suffixes_to_keep
+            )
 
     @staticmethod
     def find_stale_snapshots_within(
-        snapshots: ArrayMap[str, Snapshot],
-        tests_that_ran: ArrayMap[str, "WithinTestGC"],
+        snapshots: Union[ArrayMap[str, Snapshot], PersistentSortedMap[str, Snapshot]],
+        tests_that_ran: Union[
+            ArrayMap[str, "WithinTestGC"], PersistentSortedMap[str, "WithinTestGC"]
+        ],
         tests_that_didnt_run: Iterable[str],
     ) -> list[int]:
-        stale_indices = []
-
         # combine what we know about methods that did run with what we know about the tests that didn't
-        total_gc = tests_that_ran
-        for method in tests_that_didnt_run:
-            total_gc = total_gc.plus(method, WithinTestGC().keep_all())
+        tests_that_didnt_run_gc = type(tests_that_ran).of(
+            (method, WithinTestGC().keep_all()) for method in tests_that_didnt_run
+        )
+        total_gc = tests_that_ran.merge(
+            tests_that_didnt_run_gc,  # type: ignore
+            lambda _method, ran, _didnt_run: ran,
+        )
 
-        gc_roots = total_gc.items()
+        # the snapshots of a test are `test` and `test/suffix`, which are contiguous in the
+        # slash-first order, and the tests come in that same order
         keys = snapshots.keys()
-        # we'll start with the lowest gc, and the lowest key
-        gc_idx = 0
-        key_idx = 0
-        while key_idx < len(keys) and gc_idx < len(gc_roots):
-            key: str = keys[key_idx]  # type: ignore
-            gc: tuple[str, WithinTestGC] = gc_roots[gc_idx]  # type: ignore
-            if key.startswith(gc[0]):
-                if len(key) == len(gc[0]):
-                    # startWith + same length = exact match, no suffix
-                    if not gc[1].keeps(""):
-                        stale_indices.append(key_idx)
-                    key_idx += 1
-                    continue
-                elif key[len(gc[0])] == "/":
-                    # startWith + not same length = can safely query the `/`
-                    suffix = key[len(gc[0]) :]
-                    if not gc[1].keeps(suffix):
-                        stale_indices.append(key_idx)
-                    key_idx += 1
-                    continue
-                else:
-                    # key is longer than gc.key, but doesn't start with gc.key, so we must increment gc
-                    gc_idx += 1
-                    continue
-            else:
-                # we don't start with the key, so we must increment
-                if gc[0] < key:
-                    gc_idx += 1
-                else:
-                    # we never found a gc that started with this key, so it's stale
-                    stale_indices.append(key_idx)
-                    key_idx += 1
-
-        while key_idx < len(keys):
-            stale_indices.append(key_idx)
-            key_idx += 1
-
+        stale_indices: list[int] = []
+        next_unclaimed = 0
+        for test, gc in total_gc.items():
+            start = snapshots.range_with_prefix(test).start
+            suffixes = snapshots.range_with_prefix(f"{test}/")
+            # whatever lies between two tests belongs to neither, so it's stale
+            stale_indices.extend(range(next_unclaimed, start))
+            next_unclaimed = suffixes.stop
+            if suffixes.start > start and not gc.keeps(""):
+                # `start` is an exact match, no suffix
+                stale_indices.append(start)
+            if not gc.keeps_all():
+                stale_indices.extend(
+                    i for i in suffixes if not gc.keeps(cast(str, keys[i])[len(test) :])
+                )
+        stale_indices.extend(range(next_unclaimed, len(keys)))
         return stale_indices
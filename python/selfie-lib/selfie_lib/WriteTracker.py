@@ -1,14 +1,17 @@
-import inspect
 import os
+import sys
 import threading
+import weakref
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 from functools import total_ordering
 from pathlib import Path
+from types import CodeType, FrameType
 from typing import Generic, Optional, TypeVar, cast
 
 from .FS import FS
 from .Literals import LiteralString, LiteralTodoStub, LiteralValue, TodoStub
-from .SourceFile import SourceFile
+from .SourceCache import SourceCache
 from .TypedPath import TypedPath
 
 T = TypeVar("T")
@@ -17,8 +20,10 @@ U = TypeVar("U")
 
 @total_ordering
 class CallLocation:
+    __slots__ = ("_file_name", "_line")
+
     def __init__(self, file_name: Optional[str], line: int):
-        self._file_name = file_name
+        self._file_name = sys.intern(file_name) if file_name is not None else None
         self._line = line
 
     @property
@@ -60,9 +65,32 @@ class CallLocation:
 
 
 class CallStack:
+    __slots__ = ("__raw_rest_of_stack", "__rest_of_stack", "location")
+
     def __init__(self, location: CallLocation, rest_of_stack: list[CallLocation]):
         self.location = location
-        self.rest_of_stack = rest_of_stack
+        self.__rest_of_stack: Optional[list[CallLocation]] = rest_of_stack
+        self.__raw_rest_of_stack: Sequence[tuple[str, int]] = ()
+
+    @classmethod
+    def _of_raw(
+        cls, location: CallLocation, raw_rest_of_stack: Sequence[tuple[str, int]]
+    ) -> "CallStack":
+        """The `CallLocation` for each `(filename, line)` is only created if `rest_of_stack` is used."""
+        call_stack = cls(location, [])
+        call_stack.__rest_of_stack = None  # noqa: SLF001
+        call_stack.__raw_rest_of_stack = raw_rest_of_stack  # noqa: SLF001
+        return call_stack
+
+    @property
+    def rest_of_stack(self) -> list[CallLocation]:
+        if self.__rest_of_stack is None:
+            self.__rest_of_stack = [
+                CallLocation(file_name, line)
+                for file_name, line in self.__raw_rest_of_stack
+            ]
+            self.__raw_rest_of_stack = ()
+        return self.__rest_of_stack
 
     def ide_link(self, layout: "SnapshotFileLayout") -> str:
         links = [self.location.ide_link(layout)] + [
@@ -97,36 +125,49 @@ class SnapshotFileLayout(ABC):
         return TypedPath(os.path.abspath(Path(file_path)))
 
 
-def recordCall(callerFileOnly: bool) -> CallStack:
-    stack_frames_raw = inspect.stack()
-    first_real_frame = next(
-        (
-            i
-            for i, x in enumerate(stack_frames_raw)
-            if x.frame.f_globals.get("__package__") != __package__
-        ),
-        None,
-    )
-    # filter to only the stack after the selfie-lib package
-    stack_frames = stack_frames_raw[first_real_frame:]
-
-    if callerFileOnly:
-        caller_file = stack_frames[0].filename
-        stack_frames = [
-            frame for frame in stack_frames if frame.filename == caller_file
-        ]
+# weak, so that code which is no longer loaded isn't kept alive by the cache
+_is_selfie_code: "weakref.WeakKeyDictionary[CodeType, bool]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
-    call_locations = [
-        CallLocation(frame.filename, frame.lineno) for frame in stack_frames
-    ]
+def _is_selfie_frame(frame: FrameType) -> bool:
+    is_selfie = _is_selfie_code.get(frame.f_code)
+    if is_selfie is None:
+        is_selfie = frame.f_globals.get("__package__") == __package__
+        _is_selfie_code[frame.f_code] = is_selfie
+    return is_selfie
 
-    location = call_locations[0]
-    rest_of_stack = call_locations[1:]
 
-    return CallStack(location, rest_of_stack)
+def _caller_frame() -> FrameType:
+    """The innermost frame outside of the selfie-lib package."""
+    frame: Optional[FrameType] = sys._getframe(1)  # noqa: SLF001
+    while frame is not None and _is_selfie_frame(frame):
+        frame = frame.f_back
+    if frame is None:
+        raise RuntimeError("Selfie was called without a caller outside selfie")
+    return frame
+
+
+def recordCall(callerFileOnly: bool) -> CallStack:
+    frame: Optional[FrameType] = _caller_frame()
+    caller_file = frame.f_code.co_filename
+    location = CallLocation(caller_file, frame.f_lineno)
+
+    # line numbers change as the stack keeps running, so they are captured right away
+    raw_rest_of_stack = []
+    frame = frame.f_back
+    while frame is not None:
+        file_name = frame.f_code.co_filename
+        if not callerFileOnly or file_name == caller_file:
+            raw_rest_of_stack.append((file_name, frame.f_lineno))
+        frame = frame.f_back
+    return CallStack._of_raw(location, raw_rest_of_stack)  # noqa: SLF001
 
 
 class FirstWrite(Generic[U]):
+    __slots__ = ("call_stack", "snapshot")
+
     def __init__(self, snapshot: U, call_stack: CallStack):
         self.snapshot = snapshot
         self.call_stack = call_stack
@@ -184,7 +225,7 @@ class InlineWriteTracker(WriteTracker[CallLocation, LiteralValue]):
             and isinstance(snapshot.expected, str)
             and isinstance(snapshot.format, LiteralString)
         ):
-            content = SourceFile(file.name, layout.fs.file_read(file))
+            content = SourceCache.shared().source_file(file, layout.fs)
             try:
                 snapshot = cast(LiteralValue, snapshot)
                 parsed_value = content.parse_to_be_like(
@@ -215,36 +256,28 @@ class InlineWriteTracker(WriteTracker[CallLocation, LiteralValue]):
         # Initialize from the first write
         first_write = sorted_writes[0]
         current_file = layout.sourcefile_for_call(first_write.call_stack.location)
-        content = SourceFile(current_file.name, layout.fs.file_read(current_file))
-        delta_line_numbers = 0
+        cache = SourceCache.shared()
+        content = cache.source_file(current_file, layout.fs)
 
         for write in sorted_writes:
             # Determine the file path for the current write
             file_path = layout.sourcefile_for_call(write.call_stack.location)
             # If we switch to a new file, write changes to the disk for the previous file
             if file_path != current_file:
-                layout.fs.file_write(current_file, content.as_string)
+                cache.write(current_file, content.as_string, layout.fs)
                 current_file = file_path
-                content = SourceFile(
-                    current_file.name, layout.fs.file_read(current_file)
-                )
-                delta_line_numbers = 0
+                content = cache.source_file(current_file, layout.fs)
 
-            # Calculate the line number taking into account changes that shifted line numbers
-            line = write.call_stack.location.line + delta_line_numbers
+            # edits are recorded against the file as it was read, so its line numbers still apply
+            line = write.call_stack.location.line
             if isinstance(write.snapshot.format, LiteralTodoStub):
                 kind: TodoStub = write.snapshot.actual  # type: ignore
                 content.replace_on_line(line, f".{kind.name}_TODO(", f".{kind.name}(")
             else:
-                to_be_literal = content.parse_to_be_like(line)
-                # Attempt to set the literal value and adjust for line shifts due to content changes
-                literal_change = to_be_literal.set_literal_and_get_newline_delta(
-                    write.snapshot
-                )
-                delta_line_numbers += literal_change
+                content.parse_to_be_like(line).set_literal(write.snapshot)
 
         # Final write to disk for the last file processed
-        layout.fs.file_write(current_file, content.as_string)
+        cache.write(current_file, content.as_string, layout.fs)
 
 
 class ToBeFileLazyBytes:
@@ -1,46 +1,152 @@
+"""Public API of selfie_lib.
+
+Every name is loaded lazily on first access (PEP 562), so that importing the
+pytest plugin doesn't pay for the whole library on runs which never use it.
+"""
+
+import sys
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # maintain alphabetical order
+    from .ArrayMap import ArrayMap as ArrayMap
+    from .ArrayMap import ArrayMapBuilder as ArrayMapBuilder
+    from .ArrayMap import ArraySet as ArraySet
+    from .Atomic import AtomicReference as AtomicReference
+    from .BinaryDiff import BinaryDiff as BinaryDiff
+    from .CacheSelfie import cache_selfie as cache_selfie
+    from .CacheSelfie import cache_selfie_binary as cache_selfie_binary
+    from .CacheSelfie import cache_selfie_json as cache_selfie_json
+    from .CommentTracker import CommentTracker as CommentTracker
+    from .EscapeLeadingWhitespace import (
+        EscapeLeadingWhitespace as EscapeLeadingWhitespace,
+    )
+    from .FS import FS as FS
+    from .Lens import Camera as Camera
+    from .Lens import CompoundLens as CompoundLens
+    from .Lens import Lens as Lens
+    from .LineReader import LineReader as LineReader
+    from .Literals import LiteralValue as LiteralValue
+    from .ParseException import ParseException as ParseException
+    from .PerCharacterEscaper import PerCharacterEscaper as PerCharacterEscaper
+    from .PersistentSortedMap import PersistentSortedMap as PersistentSortedMap
+    from .Roundtrip import Roundtrip as Roundtrip
+    from .Selfie import expect_selfie as expect_selfie
+    from .SelfieImplementations import BinaryFacet as BinaryFacet
+    from .SelfieImplementations import BinarySelfie as BinarySelfie
+    from .SelfieImplementations import FluentFacet as FluentFacet
+    from .SelfieImplementations import ReprSelfie as ReprSelfie
+    from .SelfieImplementations import StringFacet as StringFacet
+    from .SelfieImplementations import StringSelfie as StringSelfie
+    from .Slice import Slice as Slice
+    from .Snapshot import Snapshot as Snapshot
+    from .Snapshot import SnapshotBuilder as SnapshotBuilder
+    from .SnapshotFile import SnapshotFile as SnapshotFile
+    from .SnapshotReader import SnapshotReader as SnapshotReader
+    from .SnapshotSystem import DiskStorage as DiskStorage
+    from .SnapshotSystem import Mode as Mode
+    from .SnapshotSystem import SnapshotSystem as SnapshotSystem
+    from .SnapshotSystem import _clearSelfieSystem as _clearSelfieSystem
+    from .SnapshotSystem import _initSelfieSystem as _initSelfieSystem
+    from .SnapshotSystem import _selfieSystem as _selfieSystem
+    from .SnapshotValue import SnapshotValue as SnapshotValue
+    from .SnapshotValueReader import SnapshotValueReader as SnapshotValueReader
+    from .SourceCache import SourceCache as SourceCache
+    from .SourceFile import SourceFile as SourceFile
+    from .TextDiff import TextDiff as TextDiff
+    from .TypedPath import TypedPath as TypedPath
+    from .WithinTestGC import WithinTestGC as WithinTestGC
+    from .WriteTracker import CallLocation as CallLocation
+    from .WriteTracker import CallStack as CallStack
+    from .WriteTracker import DiskWriteTracker as DiskWriteTracker
+    from .WriteTracker import InlineWriteTracker as InlineWriteTracker
+    from .WriteTracker import SnapshotFileLayout as SnapshotFileLayout
+    from .WriteTracker import recordCall as recordCall
+
 # maintain alphabetical order
-from .ArrayMap import ArrayMap as ArrayMap
-from .ArrayMap import ArraySet as ArraySet
-from .Atomic import AtomicReference as AtomicReference
-from .CacheSelfie import cache_selfie as cache_selfie
-from .CacheSelfie import cache_selfie_binary as cache_selfie_binary
-from .CacheSelfie import cache_selfie_json as cache_selfie_json
-from .CommentTracker import CommentTracker as CommentTracker
-from .EscapeLeadingWhitespace import EscapeLeadingWhitespace as EscapeLeadingWhitespace
-from .FS import FS as FS
-from .Lens import Camera as Camera
-from .Lens import CompoundLens as CompoundLens
-from .Lens import Lens as Lens
-from .LineReader import LineReader as LineReader
-from .Literals import LiteralValue as LiteralValue
-from .ParseException import ParseException as ParseException
-from .PerCharacterEscaper import PerCharacterEscaper as PerCharacterEscaper
-from .Roundtrip import Roundtrip as Roundtrip
-from .Selfie import expect_selfie as expect_selfie
-from .SelfieImplementations import BinaryFacet as BinaryFacet
-from .SelfieImplementations import BinarySelfie as BinarySelfie
-from .SelfieImplementations import FluentFacet as FluentFacet
-from .SelfieImplementations import ReprSelfie as ReprSelfie
-from .SelfieImplementations import StringFacet as StringFacet
-from .SelfieImplementations import StringSelfie as StringSelfie
-from .Slice import Slice as Slice
-from .Snapshot import Snapshot as Snapshot
-from .SnapshotFile import SnapshotFile as SnapshotFile
-from .SnapshotReader import SnapshotReader as SnapshotReader
-from .SnapshotSystem import DiskStorage as DiskStorage
-from .SnapshotSystem import Mode as Mode
-from .SnapshotSystem import SnapshotSystem as SnapshotSystem
-from .SnapshotSystem import _clearSelfieSystem as _clearSelfieSystem
-from .SnapshotSystem import _initSelfieSystem as _initSelfieSystem
-from .SnapshotSystem import _selfieSystem as _selfieSystem
-from .SnapshotValue import SnapshotValue as SnapshotValue
-from .SnapshotValueReader import SnapshotValueReader as SnapshotValueReader
-from .SourceFile import SourceFile as SourceFile
-from .TypedPath import TypedPath as TypedPath
-from .WithinTestGC import WithinTestGC as WithinTestGC
-from .WriteTracker import CallLocation as CallLocation
-from .WriteTracker import CallStack as CallStack
-from .WriteTracker import DiskWriteTracker as DiskWriteTracker
-from .WriteTracker import InlineWriteTracker as InlineWriteTracker
-from .WriteTracker import SnapshotFileLayout as SnapshotFileLayout
-from .WriteTracker import recordCall as recordCall
+_LAZY_EXPORTS: dict[str, str] = {
+    "ArrayMap": "ArrayMap",
+    "ArrayMapBuilder": "ArrayMap",
+    "ArraySet": "ArrayMap",
+    "AtomicReference": "Atomic",
+    "BinaryDiff": "BinaryDiff",
+    "cache_selfie": "CacheSelfie",
+    "cache_selfie_binary": "CacheSelfie",
+    "cache_selfie_json": "CacheSelfie",
+    "CommentTracker": "CommentTracker",
+    "EscapeLeadingWhitespace": "EscapeLeadingWhitespace",
+    "FS": "FS",
+    "Camera": "Lens",
+    "CompoundLens": "Lens",
+    "Lens": "Lens",
+    "LineReader": "LineReader",
+    "LiteralValue": "Literals",
+    "ParseException": "ParseException",
+    "PerCharacterEscaper": "PerCharacterEscaper",
+    "PersistentSortedMap": "PersistentSortedMap",
+    "Roundtrip": "Roundtrip",
+    "expect_selfie": "Selfie",
+    "BinaryFacet": "SelfieImplementations",
+    "BinarySelfie": "SelfieImplementations",
+    "FluentFacet": "SelfieImplementations",
+    "ReprSelfie": "SelfieImplementations",
+    "StringFacet": "SelfieImplementations",
+    "StringSelfie": "SelfieImplementations",
+    "Slice": "Slice",
+    "Snapshot": "Snapshot",
+    "SnapshotBuilder": "Snapshot",
+    "SnapshotFile": "SnapshotFile",
+    "SnapshotReader": "SnapshotReader",
+    "DiskStorage": "SnapshotSystem",
+    "Mode": "SnapshotSystem",
+    "SnapshotSystem": "SnapshotSystem",
+    "_clearSelfieSystem": "SnapshotSystem",
+    "_initSelfieSystem": "SnapshotSystem",
+    "_selfieSystem": "SnapshotSystem",
+    "SnapshotValue": "SnapshotValue",
+    "SnapshotValueReader": "SnapshotValueReader",
+    "SourceCache": "SourceCache",
+    "SourceFile": "SourceFile",
+    "TextDiff": "TextDiff",
+    "TypedPath": "TypedPath",
+    "WithinTestGC": "WithinTestGC",
+    "CallLocation": "WriteTracker",
+    "CallStack": "WriteTracker",
+    "DiskWriteTracker": "WriteTracker",
+    "InlineWriteTracker": "WriteTracker",
+    "SnapshotFileLayout": "WriteTracker",
+    "recordCall": "WriteTracker",
+}
+
+__all__ = [name for name in _LAZY_EXPORTS if not name.startswith("_")]
+
+
+def __getattr__(name: str):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # `__import__` rather than `importlib.import_module`, so that `python -X importtime` reports it
+    value = getattr(__import__(f"{__name__}.{module}", fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+class _LazyExportsModule(ModuleType):
+    def __setattr__(self, name: str, value) -> None:
+        # Importing `selfie_lib.Snapshot` binds the submodule to the package attribute
+        # `Snapshot`, which would shadow the lazily exported class of the same name.
+        if (
+            name in _LAZY_EXPORTS
+            and isinstance(value, ModuleType)
+            and value.__name__ == f"{__name__}.{_LAZY_EXPORTS[name]}"
+        ):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _LazyExportsModule
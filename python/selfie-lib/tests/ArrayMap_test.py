@@ -1,6 +1,8 @@
+import random
+
 import pytest
 
-from selfie_lib.ArrayMap import ArrayMap
+from selfie_lib.ArrayMap import ArrayMap, ArraySet
 
 
 def assertEmpty(undertest):
@@ -159,3 +161,154 @@ def test_items():
     undertest = ArrayMap.empty().plus("a", "alpha").plus("b", "beta")
     assert undertest.items()[0] == ("a", "alpha")
     assert undertest.items()[1] == ("b", "beta")
+
+
+def test_of_sorts_slash_first():
+    keys = ["a", "a/b", "a-b", "a/b/c", "b", "a b", "ab"]
+    one_by_one = ArrayMap.empty()
+    for key in keys:
+        one_by_one = one_by_one.plus(key, key.upper())
+    undertest = ArrayMap.of((key, key.upper()) for key in reversed(keys))
+    assert list(undertest.items()) == list(one_by_one.items())
+    for key in keys:
+        assert undertest[key] == key.upper()
+    assert ArrayMap.of([]) == ArrayMap.empty()
+
+
+def test_of_with_duplicate_keys():
+    with pytest.raises(KeyError):
+        ArrayMap.of([("a", "alpha"), ("b", "beta"), ("a", "alpha")])
+
+
+def test_builder():
+    builder = ArrayMap.builder().put("c", "gamma").put_all([("a", "alpha")])
+    builder.put("b", "beta")
+    assert len(builder) == 3
+    assertTriple(builder.build(), "a", "alpha", "b", "beta", "c", "gamma")
+    with pytest.raises(ValueError, match="already been built"):
+        builder.put("d", "delta")
+
+    with pytest.raises(KeyError):
+        ArrayMap.builder().put("a", "alpha").put("a", "alpha").build()
+
+
+def test_lookups_on_a_large_map():
+    keys = [f"test_{i}" for i in range(200)] + [f"test_{i}/sub" for i in range(200)]
+    undertest = ArrayMap.of((key, key.upper()) for key in keys)
+    expected = ArrayMap.empty()
+    for key in keys:
+        expected = expected.plus(key, key.upper())
+    assert list(undertest.items()) == list(expected.items())
+    # enough lookups that the map builds its index, with the same answers before and after
+    for _ in range(2):
+        for key in keys:
+            assert key in undertest
+            assert key in undertest.keys()  # noqa: SIM118
+            assert undertest[key] == key.upper()
+            assert undertest.get(key + "/missing") is None
+            assert key + "/missing" not in undertest.keys()  # noqa: SIM118
+
+    updated = undertest.plus_or_noop_or_replace("test_7", "replaced").plus(
+        "test_7/a", "inserted"
+    )
+    for key in keys:
+        assert updated[key] == ("replaced" if key == "test_7" else key.upper())
+    assert updated["test_7/a"] == "inserted"
+    assert (
+        list(updated.keys()).index("test_7/a")
+        == list(updated.keys()).index("test_7") + 1
+    )
+    assert undertest["test_7"] == "TEST_7"
+
+
+def test_lookups_on_a_large_set():
+    undertest = ArraySet.empty()
+    for i in reversed(range(100)):
+        undertest = undertest.plusOrThis(f"{i:03}")
+    assert list(undertest) == [f"{i:03}" for i in range(100)]
+    for _ in range(2):
+        for i in range(100):
+            assert f"{i:03}" in undertest
+            assert f"{i:03}/" not in undertest
+
+
+def test_range_with_prefix():
+    keys = ["a", "a/b", "a/b/c", "a b", "a-b", "ab", "b", "b/a", "\U0010ffff"]
+    undertest = ArrayMap.of((key, key) for key in keys)
+    as_set = ArraySet.empty()
+    for key in keys:
+        as_set = as_set.plusOrThis(key)
+    sorted_keys = list(undertest.keys())
+    assert list(as_set) == sorted_keys
+    for prefix in [
+        "",
+        "a",
+        "a/",
+        "a/b",
+        "a/b/",
+        "a ",
+        "ab",
+        "b",
+        "b/",
+        "c",
+        "\U0010ffff",
+    ]:
+        expected = [key for key in sorted_keys if key.startswith(prefix)]
+        found = undertest.range_with_prefix(prefix)
+        assert [sorted_keys[i] for i in found] == expected
+        assert as_set.range_with_prefix(prefix) == found
+
+
+def random_map(rng, size):
+    keys = {
+        f"test_{rng.randrange(50)}" + rng.choice(["", "/a", "/b"]) for _ in range(size)
+    }
+    return {key: rng.randrange(3) for key in keys}
+
+
+def test_merge_and_diff():
+    rng = random.Random(0)
+    for _ in range(200):
+        left = random_map(rng, rng.randrange(20))
+        right = random_map(rng, rng.randrange(20))
+        left_map = ArrayMap.of(left.items())
+        right_map = ArrayMap.of(right.items())
+
+        merged = left_map.merge(right_map)
+        assert merged == {**left, **right}
+        assert list(merged.keys()) == list(ArrayMap.of(merged.items()).keys())
+        resolved = left_map.merge(right_map, lambda key, a, b: (key, a, b))
+        assert resolved == {
+            key: (key, left[key], right[key]) if key in left and key in right else value
+            for key, value in {**left, **right}.items()
+        }
+
+        added, removed, changed = left_map.diff(right_map)
+        assert added == {k: v for k, v in right.items() if k not in left}
+        assert removed == {k: v for k, v in left.items() if k not in right}
+        assert changed == {k: v for k, v in right.items() if k in left and left[k] != v}
+
+        left_set = ArraySet.empty()
+        for key in left:
+            left_set = left_set.plusOrThis(key)
+        right_set = ArraySet.empty()
+        for key in right:
+            right_set = right_set.plusOrThis(key)
+        assert list(left_set.union(right_set)) == list(merged.keys())
+        assert list(left_set.difference(right_set)) == list(removed.keys())
+
+
+def test_merge_large_maps():
+    left = ArrayMap.of((f"test_{i}", i) for i in range(0, 200_000, 2))
+    right = ArrayMap.of((f"test_{i}", i) for i in range(0, 200_000, 3))
+    merged = left.merge(right)
+    assert len(merged) == 100_000 + 66_667 - 33_334
+    assert merged["test_6"] == 6
+    assert len(left.diff(right).removed) == 100_000 - 33_334
+
+
+def test_array_set_of():
+    undertest = ArraySet.of(["b", "a/b", "a", "a-b", "a", "b"])
+    assert list(undertest) == ["a", "a/b", "a-b", "b"]
+    assert "a/b" in undertest
+    assert ArraySet.of([]) == ArraySet.empty()
@@ -0,0 +1,60 @@
+from selfie_lib import BinaryDiff, Mode
+
+
+def test_equal():
+    undertest = BinaryDiff.of(b"abc", b"abc")
+    assert not undertest
+    assert undertest.first_offset is None
+    assert str(undertest) == ""
+
+
+def test_hexdump_around_the_first_difference():
+    actual = bytearray(range(100))
+    actual[50] = ord("!")
+    undertest = BinaryDiff.of(bytes(range(100)), bytes(actual))
+    assert undertest.first_offset == 50
+    assert str(undertest).splitlines()[3:] == [
+        " 00000000  00 01 02 03 04 05 06 07 08 09 0a 0b 0c 0d 0e 0f  |................|",
+        " 00000010  10 11 12 13 14 15 16 17 18 19 1a 1b 1c 1d 1e 1f  |................|",
+        " 00000020  20 21 22 23 24 25 26 27 28 29 2a 2b 2c 2d 2e 2f  | !\"#$%&'()*+,-./|",
+        "-00000030  30 31 32 33 34 35 36 37 38 39 3a 3b 3c 3d 3e 3f  |0123456789:;<=>?|",
+        "+00000030  30 31 21 33 34 35 36 37 38 39 3a 3b 3c 3d 3e 3f  |01!3456789:;<=>?|",
+        " 00000040  40 41 42 43 44 45 46 47 48 49 4a 4b 4c 4d 4e 4f  |@ABCDEFGHIJKLMNO|",
+        " 00000050  50 51 52 53 54 55 56 57 58 59 5a 5b 5c 5d 5e 5f  |PQRSTUVWXYZ[\\]^_|",
+        " 00000060  60 61 62 63                                      |`abc|",
+    ]
+
+
+def test_different_lengths():
+    undertest = BinaryDiff.of(b"hello world", b"hello world, and more")
+    assert undertest.first_offset == 11
+    assert str(undertest) == (
+        "first difference at offset 11 (0xb)\n"
+        "expected: 11 bytes, blake2b e9a804b2e527fd3601d2ffc0bb023cd6\n"
+        "  actual: 21 bytes, blake2b 33e9f54141616c06015151d4d7c432cc\n"
+        "-00000000  68 65 6c 6c 6f 20 77 6f 72 6c 64                 |hello world|\n"
+        "+00000000  68 65 6c 6c 6f 20 77 6f 72 6c 64 2c 20 61 6e 64  |hello world, and|\n"
+        "+00000010  20 6d 6f 72 65                                   | more|"
+    )
+
+
+def test_huge_binaries():
+    expected = bytes(2_000_000)
+    actual = bytearray(expected)
+    actual[1_900_005] = ord("!")
+    undertest = Mode.readonly.msg_snapshot_mismatch_binary(expected, bytes(actual))
+    zeros = "00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00  |................|"
+    assert undertest.splitlines() == [
+        "Snapshot mismatch",
+        "first difference at offset 1900005 (0x1cfde5)",
+        "expected: 2000000 bytes, blake2b 7dd0754afb3eb373f2a459ff542ec114",
+        "  actual: 2000000 bytes, blake2b 1f960a756f0a7f27d89a9fe4da0aa2ee",
+        f" 001cfdb0  {zeros}",
+        f" 001cfdc0  {zeros}",
+        f" 001cfdd0  {zeros}",
+        f"-001cfde0  {zeros}",
+        "+001cfde0  00 00 00 00 00 21 00 00 00 00 00 00 00 00 00 00  |.....!..........|",
+        f" 001cfdf0  {zeros}",
+        f" 001cfe00  {zeros}",
+        f" 001cfe10  {zeros}",
+    ]
@@ -0,0 +1,84 @@
+import pytest
+
+from selfie_lib import (
+    Mode,
+    Snapshot,
+    StringSelfie,
+    TypedPath,
+    _clearSelfieSystem,
+    _initSelfieSystem,
+)
+from selfie_lib.SnapshotSystem import SnapshotSystem
+
+
+class CountingSnapshotSystem(SnapshotSystem):
+    def __init__(self, mode: Mode, has_writable_comment: bool):
+        self._mode = mode
+        self.has_writable_comment = has_writable_comment
+        self.comment_checks = 0
+
+    @property
+    def fs(self):
+        raise NotImplementedError
+
+    @property
+    def mode(self) -> Mode:
+        return self._mode
+
+    @property
+    def layout(self):
+        raise NotImplementedError
+
+    def source_file_has_writable_comment(self, call) -> bool:  # noqa: ARG002
+        self.comment_checks += 1
+        if self.has_writable_comment and self._mode == Mode.readonly:
+            raise AssertionError("illegal comment")
+        return self.has_writable_comment
+
+    def write_inline(self, literal_value, call):
+        raise NotImplementedError
+
+    def write_to_be_file(self, path: TypedPath, data, call):
+        raise NotImplementedError
+
+    def disk_thread_local(self):
+        raise NotImplementedError
+
+
+@pytest.fixture
+def system(request):
+    system = CountingSnapshotSystem(*request.param)
+    _initSelfieSystem(system)
+    yield system
+    _clearSelfieSystem(system)
+
+
+def to_be_twice():
+    for _ in range(2):
+        StringSelfie(Snapshot.of("passing"), None).to_be("passing")  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "system",
+    [(Mode.interactive, False), (Mode.interactive, True), (Mode.readonly, False)],
+    indirect=True,
+)
+def test_passing_assertion_checks_each_caller_once(system):
+    to_be_twice()
+    assert system.comment_checks == 1
+    to_be_twice()
+    assert system.comment_checks == 1
+
+
+@pytest.mark.parametrize("system", [(Mode.overwrite, True)], indirect=True)
+def test_overwrite_mode_never_checks(system):
+    to_be_twice()
+    assert system.comment_checks == 0
+
+
+@pytest.mark.parametrize("system", [(Mode.readonly, True)], indirect=True)
+def test_readonly_mode_always_fails_on_writable_comment(system):
+    for _ in range(2):
+        with pytest.raises(AssertionError, match="illegal comment"):
+            to_be_twice()
+    assert system.comment_checks == 2
@@ -0,0 +1,52 @@
+import importlib
+import os
+import subprocess
+import sys
+from types import ModuleType
+
+import selfie_lib
+
+
+def import_time(statement: str) -> dict[str, int]:
+    """Runs `statement` in a fresh interpreter with `python -X importtime`, returns the cumulative microseconds of each imported module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def selfie_submodules(modules: dict[str, int]) -> list[str]:
+    return sorted(name for name in modules if name.startswith("selfie_lib."))
+
+
+def test_import_loads_no_submodules():
+    modules = import_time("import selfie_lib")
+    assert "selfie_lib" in modules
+    assert selfie_submodules(modules) == []
+
+
+def test_first_use_loads_only_what_it_needs():
+    modules = import_time("from selfie_lib import TypedPath")
+    assert selfie_submodules(modules) == ["selfie_lib.TypedPath"]
+
+
+def test_every_export_resolves():
+    for name in selfie_lib.__all__:
+        assert not isinstance(getattr(selfie_lib, name), ModuleType), name
+    assert "expect_selfie" in selfie_lib.__all__
+    assert "_initSelfieSystem" not in selfie_lib.__all__
+
+
+def test_submodule_import_does_not_shadow_export():
+    module = importlib.import_module("selfie_lib.SnapshotFile")
+    assert selfie_lib.SnapshotFile is module.SnapshotFile
@@ -1,6 +1,34 @@
+import random
+
 import pytest
 
-from selfie_lib import PerCharacterEscaper
+from selfie_lib import PerCharacterEscaper, SnapshotValueReader
+
+
+def reference_escape(escaped: str, escaped_by: str, input_string: str) -> str:
+    escape = escaped[0]
+    result = []
+    for char in input_string:
+        idx = escaped.find(char)
+        result.append(char if idx == -1 else escape + escaped_by[idx])
+    return "".join(result)
+
+
+def reference_unescape(escaped: str, escaped_by: str, input_string: str) -> str:
+    escape = escaped[0]
+    result = []
+    i = 0
+    while i < len(input_string):
+        char = input_string[i]
+        if char == escape and i + 1 < len(input_string):
+            next_char = input_string[i + 1]
+            idx = escaped_by.find(next_char)
+            result.append(next_char if idx == -1 else escaped[idx])
+            i += 2
+        else:
+            result.append(char)
+            i += 1
+    return "".join(result)
 
 
 class TestPerCharacterEscaper:
@@ -84,3 +112,28 @@ class TestPerCharacterEscaper:
 
         roundtrip("")
         roundtrip("<local>~`/")
+
+
+@pytest.mark.parametrize(
+    ("escaper", "escaped", "escaped_by"),
+    [
+        (SnapshotValueReader.name_esc, "\\[]\n\t╔╗═", "\\()nt┌┐─"),
+        (
+            SnapshotValueReader.body_esc,
+            "\ud801\udf43\ud801\udf41",
+            "\ud801\udf43\ud801\udf41",
+        ),
+        (PerCharacterEscaper.self_escape("`1`2"), "`1`2", "`1`2"),
+    ],
+)
+def test_same_as_character_by_character(escaper, escaped, escaped_by):
+    rng = random.Random(12)
+    alphabet = "ab\\[]()\n\tnt╔╗═┌┐─`12\ud801\udf43\udf41"
+    for _ in range(2000):
+        s = "".join(rng.choice(alphabet) for _ in range(rng.randrange(12)))
+        assert escaper.escape(s) == reference_escape(escaped, escaped_by, s)
+        if s.endswith(escaped[0]) and not s.endswith(escaped[0] * 2):
+            with pytest.raises(ValueError, match="last character"):
+                escaper.unescape(s)
+        else:
+            assert escaper.unescape(s) == reference_unescape(escaped, escaped_by, s)
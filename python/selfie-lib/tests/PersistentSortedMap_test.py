@@ -0,0 +1,165 @@
+import importlib
+import os
+import random
+import time
+
+import pytest
+
+from selfie_lib import PersistentSortedMap
+from selfie_lib.ArrayMap import ArrayMap
+
+# the module, which the lazily exported class of the same name shadows
+tree = importlib.import_module("selfie_lib.PersistentSortedMap")
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Small nodes, so that a few hundred entries already make a deep tree."""
+    monkeypatch.setattr(tree, "_MAX_CHUNK", 4)
+
+
+def assert_same(undertest: PersistentSortedMap, expected: ArrayMap):
+    assert len(undertest) == len(expected)
+    assert list(undertest) == list(expected)
+    assert list(undertest.keys()) == list(expected.keys())
+    assert list(undertest.values()) == list(expected.values())
+    assert list(undertest.items()) == list(expected.items())
+    assert undertest == expected
+    for i, (key, value) in enumerate(expected.items()):
+        assert undertest[key] == value
+        assert key in undertest
+        assert undertest.keys()[i] == key
+        assert undertest.items()[i] == (key, value)
+
+
+def test_empty():
+    undertest = PersistentSortedMap.empty()
+    assert len(undertest) == 0
+    assert list(undertest.items()) == []
+    assert undertest == {}
+    with pytest.raises(KeyError):
+        _ = undertest["key"]
+    assert PersistentSortedMap.of([]) == undertest
+    assert undertest.minus_sorted_indices([]) is undertest
+
+
+def test_slash_first_order():
+    keys = ["a", "a/b", "a-b", "a/b/c", "b", "a b", "ab"]
+    expected = ArrayMap.of((key, key) for key in keys)
+    assert_same(PersistentSortedMap.of((key, key) for key in keys), expected)
+    undertest = PersistentSortedMap.empty()
+    for key in keys:
+        undertest = undertest.plus(key, key)
+    assert_same(undertest, expected)
+
+
+def test_same_as_array_map(small_chunks):  # noqa: ARG001
+    rng = random.Random(0)
+    undertest = PersistentSortedMap.empty()
+    expected = ArrayMap.empty()
+    for _ in range(3000):
+        key = f"test_{rng.randrange(300)}" + rng.choice(["", "/a", "/b"])
+        value = rng.randrange(3)
+        op = rng.randrange(5)
+        if op == 0 and key not in expected:
+            undertest = undertest.plus(key, value)
+            expected = expected.plus(key, value)
+        elif op == 1:
+            undertest = undertest.plus_or_noop(key, value)
+            expected = expected.plus_or_noop(key, value)
+        elif op == 2:
+            undertest = undertest.plus_or_noop_or_replace(key, value)
+            expected = expected.plus_or_noop_or_replace(key, value)
+        elif op == 3 and expected:
+            indices = sorted(
+                rng.sample(range(len(expected)), rng.randrange(min(len(expected), 3)))
+            )
+            undertest = undertest.minus_sorted_indices(indices)
+            expected = expected.minus_sorted_indices(indices)
+        elif op == 4:
+            assert undertest.get(key) == expected.get(key)
+    assert_same(undertest, expected)
+    assert_same(PersistentSortedMap.of(expected.items()), expected)
+
+    indices = list(range(0, len(expected), 2))
+    assert_same(
+        undertest.minus_sorted_indices(indices), expected.minus_sorted_indices(indices)
+    )
+
+
+def test_unchanged_maps_are_returned_as_is():
+    undertest = PersistentSortedMap.of([("a", 1), ("b", 2)])
+    with pytest.raises(KeyError):
+        undertest.plus("a", 3)
+    assert undertest.plus_or_noop("a", 3) is undertest
+    assert undertest.plus_or_noop_or_replace("a", 1) is undertest
+    assert undertest.plus_or_noop_or_replace("a", 3) == {"a": 3, "b": 2}
+    assert undertest == {"a": 1, "b": 2}
+    with pytest.raises(KeyError):
+        PersistentSortedMap.of([("a", 1), ("a", 1)])
+
+
+def test_updates_share_structure():
+    undertest = PersistentSortedMap.of((f"test_{i:05}", i) for i in range(10_000))
+    updated = undertest.plus_or_noop_or_replace("test_05000", "new")
+    shared = sum(
+        old is new
+        for old, new in zip(
+            tree._leaves(undertest._root),  # noqa: SLF001
+            tree._leaves(updated._root),  # noqa: SLF001
+        )
+    )
+    assert shared == 10_000 // tree._MAX_CHUNK  # noqa: SLF001
+    assert undertest["test_05000"] == 5000
+    assert updated["test_05000"] == "new"
+
+
+@pytest.mark.skipif(
+    "SELFIE_BENCHMARK" not in os.environ,
+    reason="a wall-clock benchmark, set SELFIE_BENCHMARK to run it",
+)
+def test_benchmark_updates_against_array_map():
+    """Updating a large `ArrayMap` copies all of it, a `PersistentSortedMap` only copies one path."""
+    pairs = [(f"test_{i}", i) for i in range(50_000)]
+    updates = [f"test_{i}/sub" for i in range(0, 50_000, 100)]
+
+    def time_updates(undertest) -> float:
+        start = time.perf_counter()
+        for key in updates:
+            undertest = undertest.plus_or_noop_or_replace(key, key)
+        return time.perf_counter() - start
+
+    array_map = time_updates(ArrayMap.of(pairs))
+    persistent = time_updates(PersistentSortedMap.of(pairs))
+    assert persistent < array_map
+
+
+def test_range_with_prefix(small_chunks):  # noqa: ARG001
+    keys = [f"test_{i}" + suffix for i in range(40) for suffix in ["", "/a", "/b"]]
+    undertest = PersistentSortedMap.of((key, key) for key in keys)
+    expected = ArrayMap.of((key, key) for key in keys)
+    for prefix in ["", "test_", "test_1", "test_1/", "test_12/a", "test_5", "zzz"]:
+        assert undertest.range_with_prefix(prefix) == expected.range_with_prefix(prefix)
+
+
+def test_merge_and_diff(small_chunks):  # noqa: ARG001
+    left = [(f"test_{i}", i) for i in range(0, 300, 2)]
+    right = [(f"test_{i}", -i if i % 4 else i) for i in range(0, 300, 3)]
+
+    def resolve(_key, a, b):
+        return max(a, b)
+
+    undertest = PersistentSortedMap.of(left).merge(
+        PersistentSortedMap.of(right), resolve
+    )
+    expected = ArrayMap.of(left).merge(ArrayMap.of(right), resolve)
+    assert expected["test_6"] == 6
+    assert_same(undertest, expected)
+
+    undertest = PersistentSortedMap.of(left).diff(PersistentSortedMap.of(right))
+    expected = ArrayMap.of(left).diff(ArrayMap.of(right))
+    for part, expected_part in zip(undertest, expected):
+        # the parts are maps of the same type as the ones which were diffed
+        assert isinstance(part, PersistentSortedMap)
+        assert isinstance(expected_part, ArrayMap)
+        assert_same(part, expected_part)
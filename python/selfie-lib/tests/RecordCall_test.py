@@ -49,3 +49,47 @@ def test_record_call_with_caller_file_only_true():
     assert (
         len(call_stack.rest_of_stack) >= 0
     ), "Expected the rest of stack to potentially contain only the caller's file location"
+
+
+def _this_line() -> int:
+    import sys
+
+    return sys._getframe(1).f_lineno  # noqa: SLF001
+
+
+def _record_call_in_helper() -> tuple[CallStack, int]:
+    return recordCall(False), _this_line()
+
+
+def test_record_call_captures_the_stack_at_call_time():
+    import inspect
+
+    call_stack, helper_line = _record_call_in_helper()
+    line = _this_line() - 1
+    assert call_stack.location == CallLocation(__file__, helper_line)
+    # the caller has moved on since then, but the stack remembers where it was
+    assert call_stack.rest_of_stack[0] == CallLocation(__file__, line)
+    assert call_stack.rest_of_stack[1:] == [
+        CallLocation(frame.filename, frame.lineno) for frame in inspect.stack()[1:]
+    ]
+
+
+def test_record_call_with_caller_file_only_filters_other_files():
+    call_stack, _ = _record_call_in_helper()
+    assert any(loc.file_name != __file__ for loc in call_stack.rest_of_stack)
+    call_stack = recordCall(True)
+    assert all(loc.file_name == __file__ for loc in call_stack.rest_of_stack)
+
+
+def test_record_call_doesnt_keep_code_alive():
+    import gc
+    import weakref
+
+    namespace: dict = {}
+    exec("def caller(record):\n    return record(False)", namespace)
+    code = weakref.ref(namespace["caller"].__code__)
+    call_stack = namespace["caller"](recordCall)
+    assert call_stack.location.file_name == "<string>"
+    del namespace
+    gc.collect()
+    assert code() is None
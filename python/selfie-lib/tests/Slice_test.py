@@ -19,3 +19,22 @@ def test_replace_self():
     justB = undertest.subSequence(1, 2)
     assert str(justB) == "B"
     assert justB.replaceSelfWith("D") == "ADC"
+
+
+def test_native_primitives():
+    base = Slice("  \tabc def\n ")
+    assert str(base.trim()) == "abc def"
+    assert str(Slice(" \n\t ").trim()) == ""
+    undertest = base.subSequence(3, 6)
+    assert str(undertest) == "abc"
+    assert undertest.sameAs("abc")
+    assert not undertest.sameAs("abcd")
+    assert not undertest.sameAs("ab")
+    assert undertest.starts_with("ab")
+    assert not undertest.starts_with("abc ")
+    assert undertest == Slice("abc")
+    assert hash(undertest) == hash(Slice("abc"))
+    assert base.count("\n") == 1
+    assert undertest.count("\n") == 0
+    assert base.baseLineAtOffset(10) == 1
+    assert base.baseLineAtOffset(11) == 2
@@ -1,3 +1,10 @@
+import base64
+import binascii
+import os
+import stat
+
+import pytest
+
 from selfie_lib import Snapshot, SnapshotFile, SnapshotValueReader
 
 
@@ -64,3 +71,138 @@ Orange
 """
 
     assert "".join(buffer) == expected_output
+
+
+def test_map_file(tmp_path):
+    path = tmp_path / "test.ss"
+    path.write_bytes(
+        """╔═ Apple ═╗
+Granny Smith
+╔═ Apple[color] ═╗
+green
+╔═ Broken ═╗ base64 length 1 bytes
+not base64!
+╔═ Orange ═╗
+Orange
+╔═ [end of file] ═╗
+""".encode()
+    )
+    file = SnapshotFile.map_file(str(path))
+    assert list(file.snapshots.keys()) == ["Apple", "Broken", "Orange"]
+    # values are only decoded once they are used
+    assert file.snapshots["Apple"] == Snapshot.of("Granny Smith").plus_facet(
+        "color", "green"
+    )
+    with pytest.raises(binascii.Error):
+        file.snapshots["Broken"].subject  # noqa: B018
+
+    file.remove_all_indices([1])
+    file.close()
+    # everything is still readable after the mapping is released
+    assert file.snapshots["Orange"] == Snapshot.of("Orange")
+
+
+def test_map_empty_file(tmp_path):
+    path = tmp_path / "test.ss"
+    path.write_bytes(b"")
+    file = SnapshotFile.map_file(str(path))
+    assert not file.snapshots
+    file.close()
+
+
+def test_write_file(tmp_path):
+    path = tmp_path / "test.ss"
+    large = bytes(range(256)) * 1000
+    file = SnapshotFile()
+    file.snapshots = file.snapshots.plus(
+        "Apple", Snapshot.of("Granny\nSmith").plus_facet("color", "green")
+    )
+    file.snapshots = file.snapshots.plus("Large", Snapshot.of(large))
+
+    file.write_file(str(path))
+    buffer = []
+    file.serialize(buffer)
+    assert path.read_bytes() == "".join(buffer).encode()
+    assert f"\n{base64.b64encode(large).decode()}\n".encode() in path.read_bytes()
+
+    file.unix_newlines = False
+    file.write_file(str(path))
+    assert path.read_bytes() == "".join(buffer).replace("\n", "\r\n").encode()
+    reread = SnapshotFile.map_file(str(path))
+    assert not reread.unix_newlines
+    assert list(reread.snapshots.items()) == list(file.snapshots.items())
+    reread.close()
+    assert [p.name for p in tmp_path.iterdir()] == ["test.ss"]
+
+
+def test_write_file_failure_keeps_old_content(tmp_path):
+    path = tmp_path / "test.ss"
+    path.write_bytes(b"old content")
+    file = SnapshotFile()
+    file.snapshots = file.snapshots.plus("Broken", Snapshot.of("\ud800"))
+    with pytest.raises(UnicodeEncodeError):
+        file.write_file(str(path))
+    assert path.read_bytes() == b"old content"
+    assert [p.name for p in tmp_path.iterdir()] == ["test.ss"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="windows has no permission bits")
+def test_write_file_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "test.ss"
+    path.write_bytes(b"old content")
+    path.chmod(0o640)
+    file = SnapshotFile()
+    file.snapshots = file.snapshots.plus("Apple", Snapshot.of("Granny Smith"))
+    assert file.write_file(str(path))
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_write_file_skips_identical_content(tmp_path):
+    path = tmp_path / "test.ss"
+    for newline in ["\n", "\r\n"]:
+        content = (
+            f"╔═ Apple ═╗{newline}Granny Smith{newline}╔═ [end of file] ═╗{newline}"
+        )
+        path.write_bytes(content.encode())
+        before = path.stat()
+        file = SnapshotFile.map_file(str(path))
+        file.set_at_test_time("Apple", Snapshot.of("Granny Smith"))
+        assert file.was_set_at_test_time
+        assert not file.write_file(str(path))
+        assert path.stat().st_mtime_ns == before.st_mtime_ns
+        assert path.stat().st_ino == before.st_ino
+        # and the file isn't mapped anymore
+        scanner = file._scanner  # noqa: SLF001
+        assert scanner is not None
+        assert isinstance(scanner.content, bytes)
+
+
+def test_write_file_copies_unchanged_snapshots(tmp_path):
+    path = tmp_path / "test.ss"
+    # a non-canonical but valid entry, which would be written differently if re-serialized
+    untouched = "╔═ Apple ═╗\r\nGranny\r\r\nSmith\r\n╔═ Apple[color] ═╗\r\ngreen\r\n"
+    path.write_bytes(
+        (
+            untouched
+            + "╔═ Orange ═╗\r\nOrange\r\n╔═ [end of file] ═╗\r\n"
+            + "after the end"
+        ).encode()
+    )
+    file = SnapshotFile.map_file(str(path))
+    file.set_at_test_time("Orange", Snapshot.of("Blood\nOrange"))
+    file.set_at_test_time("Pear", Snapshot.of(b"pear"))
+    assert file.write_file(str(path))
+    assert (
+        path.read_bytes()
+        == (
+            untouched
+            + "╔═ Orange ═╗\r\nBlood\r\nOrange\r\n"
+            + "╔═ Pear ═╗ base64 length 4 bytes\r\ncGVhcg==\r\n"
+            + "╔═ [end of file] ═╗\r\n"
+        ).encode()
+    )
+    assert [p.name for p in tmp_path.iterdir()] == ["test.ss"]
+    # the mapping was released, but unchanged snapshots can still be read
+    assert file.snapshots["Apple"] == Snapshot.of("Granny\nSmith").plus_facet(
+        "color", "green"
+    )
@@ -1,4 +1,9 @@
-from selfie_lib import Snapshot
+import sys
+
+import pytest
+
+from selfie_lib import Snapshot, SnapshotValue
+from selfie_lib.SnapshotValue import SnapshotValueBinary
 
 
 def test_items():
@@ -24,3 +29,85 @@ def test_repr():
         )
         == "Snapshot.of('subject')\n  .plus_facet('apple', 'green')\n  .plus_facet('orange', 'peel')"
     )
+
+
+def test_builder():
+    builder = Snapshot.builder("subject")
+    for i in reversed(range(20)):
+        builder.plus_facet(f"key{i:02}", f"value{i}")
+    expected = Snapshot.of("subject")
+    for i in range(20):
+        expected = expected.plus_facet(f"key{i:02}", f"value{i}")
+    assert builder.build() == expected
+
+    builder.plus_or_replace("", "new subject").plus_or_replace("key00", "new value")
+    assert builder.build() == expected.plus_or_replace(
+        "", "new subject"
+    ).plus_or_replace("key00", "new value")
+
+
+def test_builder_rejects_what_plus_facet_rejects():
+    builder = Snapshot.builder().plus_facet("key", "value")
+    with pytest.raises(KeyError):
+        builder.plus_facet("key", "other")
+    with pytest.raises(ValueError, match="reserved for the subject"):
+        builder.plus_facet("", "other")
+
+
+def test_snapshots_are_compact():
+    undertest = Snapshot.of("subject").plus_facet("md", "text")
+    undertest = undertest.plus_facet("image/png", b"png")
+    for part in [
+        undertest,
+        undertest.subject,
+        undertest.subject_or_facet("image/png"),
+        undertest.facets,
+    ]:
+        assert not hasattr(part, "__dict__")
+    # a snapshot without facets shares the empty map
+    assert Snapshot.of("a").facets is Snapshot.of("b").facets
+    # facet keys are interned, even when they are built at runtime
+    extension = "png"
+    key = f"image/{extension}"
+    interned = sys.intern(key)
+    assert interned is not key
+    for snapshot in [
+        undertest,
+        Snapshot.of("subject").plus_facet(key, "png"),
+        Snapshot.of("subject").plus_or_replace(key, "png"),
+        Snapshot.builder("subject").plus_facet(key, "png").build(),
+    ]:
+        assert next(k for k in snapshot.facets if k == key) is interned
+
+
+def test_equality_and_hash():
+    assert SnapshotValue.of("a") == SnapshotValue.of("a")
+    assert SnapshotValue.of("a") != SnapshotValue.of("b")
+    assert SnapshotValue.of("a") != SnapshotValue.of("ab")
+    assert SnapshotValue.of("a") != SnapshotValue.of(b"a")
+    assert SnapshotValue.of(b"a") == SnapshotValue.of(b"a")
+    assert hash(SnapshotValue.of("a")) == hash(SnapshotValue.of("a"))
+
+    undertest = Snapshot.of("subject").plus_facet("a", "1").plus_facet("b", b"2")
+    same = Snapshot.of("subject").plus_facet("b", b"2").plus_facet("a", "1")
+    assert undertest == same
+    assert hash(undertest) == hash(same)
+    assert undertest != same.plus_or_replace("b", "2")
+    assert undertest != same.plus_facet("c", "3")
+    assert undertest != same.plus_or_replace("", "other")
+    assert undertest != Snapshot.of("subject").plus_facet("a", "1").plus_facet(
+        "c", b"2"
+    )
+
+
+def test_cached_hashes_short_circuit_binary_equality():
+    size = 1_000_000
+    left = SnapshotValueBinary(b"x" * size + b"a")
+    right = SnapshotValueBinary(b"x" * size + b"b")
+    assert hash(left) != hash(right)
+    # a value whose cached hash doesn't match is unequal, without looking at the content
+    same_content = SnapshotValueBinary(b"x" * size + b"a")
+    same_content._hash = hash(right)  # noqa: SLF001
+    assert left != same_content
+    assert left != right
+    assert left == SnapshotValue.of(b"x" * size + b"a")
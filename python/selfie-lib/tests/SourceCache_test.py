@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from selfie_lib import FS, SourceCache, TypedPath
+
+
+class CountingFS(FS):
+    def __init__(self):
+        self.reads = 0
+
+    def file_read_binary(self, typed_path: TypedPath) -> bytes:
+        self.reads += 1
+        return super().file_read_binary(typed_path)
+
+    def assert_failed(self, message, expected=None, actual=None) -> Exception:  # noqa: ARG002
+        return AssertionError(message)
+
+
+def test_reads_each_version_once(tmp_path):
+    file = tmp_path / "some_test.py"
+    file.write_text("x = 1\n")
+    path = TypedPath.of_file(str(file))
+    fs = CountingFS()
+    undertest = SourceCache()
+    assert undertest.read(path, fs) == "x = 1\n"
+    assert undertest.read(path, fs) == "x = 1\n"
+    assert undertest.source_file(path, fs).as_string == "x = 1\n"
+    assert fs.reads == 1
+
+    # a change of size or mtime is noticed
+    file.write_text("x = 22\n")
+    assert undertest.read(path, fs) == "x = 22\n"
+    assert fs.reads == 2
+    stat = os.stat(file)
+    file.write_text("x = 33\n")
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert undertest.read(path, fs) == "x = 33\n"
+    assert fs.reads == 3
+
+
+def test_writes_invalidate(tmp_path):
+    file = tmp_path / "some_test.py"
+    file.write_text("expect_selfie(1).to_be_TODO()\n")
+    path = TypedPath.of_file(str(file))
+    fs = CountingFS()
+    undertest = SourceCache()
+    source = undertest.source_file(path, fs)
+    source.replace_on_line(1, ".to_be_TODO(", ".to_be(")
+    # edits to one `SourceFile` aren't seen by the next one
+    assert (
+        undertest.source_file(path, fs).as_string == "expect_selfie(1).to_be_TODO()\n"
+    )
+    undertest.write(path, source.as_string, fs)
+    assert undertest.read(path, fs) == "expect_selfie(1).to_be()\n"
+    assert fs.reads == 2
+
+
+def test_missing_files_are_not_cached(tmp_path):
+    path = TypedPath.of_file(str(tmp_path / "missing.py"))
+    undertest = SourceCache()
+    with pytest.raises(FileNotFoundError):
+        undertest.read(path)
+    assert SourceCache.shared() is SourceCache.shared()
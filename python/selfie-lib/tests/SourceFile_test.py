@@ -1,6 +1,7 @@
 import pytest
 
-from selfie_lib import SourceFile
+from selfie_lib import LiteralValue, SourceFile
+from selfie_lib.Literals import LiteralRepr, LiteralString
 
 
 def python_test(source_raw, function_call_plus_arg_raw, arg_raw=""):
@@ -88,3 +89,51 @@ def error_non_primitive():
         ".to_be('''1''' + '''1''')",
         "Non-primitive literal in `.to_be()` starting at line 1: error for character `+` on line 1",
     )
+
+
+def test_edits_use_the_original_line_numbers():
+    lines = [f"x{i} = expect_selfie({i}).to_be_TODO()" for i in range(50)]
+    undertest = SourceFile("UnderTest.py", "\n".join(lines) + "\n")
+    for i in range(0, 50, 3):
+        if i % 2:
+            undertest.replace_on_line(i + 1, ".to_be_TODO(", ".to_be(")
+            lines[i] = lines[i].replace(".to_be_TODO(", ".to_be(")
+        else:
+            undertest.parse_to_be_like(i + 1).set_literal(
+                LiteralValue(None, f"line\n{i}\nof text", LiteralString())
+            )
+            lines[i] = lines[i].replace(
+                ".to_be_TODO()", f'.to_be("""line\n{i}\nof text""")'
+            )
+    assert undertest.as_string == "\n".join(lines) + "\n"
+    # reading the result doesn't apply the edits, so the original line numbers still hold
+    undertest.replace_on_line(2, ".to_be_TODO(", ".to_be(")
+    lines[1] = lines[1].replace(".to_be_TODO(", ".to_be(")
+    assert undertest.as_string == "\n".join(lines) + "\n"
+    with pytest.raises(AssertionError):
+        undertest._line(lines.__len__() * 2)  # noqa: SLF001
+
+
+def test_overlapping_edits_are_rejected():
+    undertest = SourceFile("UnderTest.py", "x = expect_selfie(1).to_be_TODO()\n")
+    undertest.replace_on_line(1, ".to_be_TODO(", ".to_be(")
+    with pytest.raises(ValueError, match="overlaps an earlier edit"):
+        undertest.replace_on_line(1, "_TODO", "")
+
+
+def test_many_rewrites_in_a_large_file_are_linear(monkeypatch):
+    lines = [f"    expect_selfie({i}).to_be_TODO()" for i in range(10_000)]
+    undertest = SourceFile("UnderTest.py", "\n".join(lines) + "\n")
+    # the content and its line index are built once, rather than once per rewrite
+    rebuilds = []
+    monkeypatch.setattr(
+        SourceFile, "_set_content", lambda _self, content: rebuilds.append(content)
+    )
+    for i in range(0, 10_000, 10):
+        undertest.parse_to_be_like(i + 1).set_literal(
+            LiteralValue(None, i, LiteralRepr())
+        )
+    result = undertest.as_string
+    assert rebuilds == []
+    assert result.count(".to_be_TODO()") == 9_000
+    assert "expect_selfie(9990).to_be(9_990)" in result
@@ -0,0 +1,202 @@
+import importlib
+import random
+
+import pytest
+
+from selfie_lib import Mode, Snapshot, TextDiff
+from selfie_lib.TextDiff import _common_prefix_length, _common_suffix_length
+
+# the module, which the lazily exported class of the same name shadows
+text_diff = importlib.import_module("selfie_lib.TextDiff")
+
+
+@pytest.fixture(autouse=True)
+def _no_time_budget(monkeypatch):
+    # the time budget is only a safety net, the edit and line budgets decide what is shown
+    monkeypatch.setattr(text_diff, "_TIME_BUDGET", float("inf"))
+
+
+def test_equal():
+    undertest = TextDiff.of("a\nb\n", "a\nb\n")
+    assert not undertest
+    assert undertest.first_line is None
+    assert str(undertest) == ""
+
+
+def test_changed_line():
+    undertest = TextDiff.of("a\nb\nc\nd\ne\nf\n", "a\nb\nc\nD\ne\nf\n")
+    assert undertest.first_line == 4
+    assert undertest.first_column == 1
+    assert str(undertest) == (
+        "first difference at line 4, column 1\n"
+        "@@ -1,6 +1,6 @@\n"
+        " a\n"
+        " b\n"
+        " c\n"
+        "-d\n"
+        "+D\n"
+        " e\n"
+        " f"
+    )
+
+
+def test_partial_lines_and_newlines():
+    assert str(TextDiff.of("a\nb\n", "a\nxb\n")) == (
+        "first difference at line 2, column 1\n@@ -1,2 +1,2 @@\n a\n-b\n+xb"
+    )
+    assert str(TextDiff.of("x\n", "x")) == (
+        "first difference at line 1, column 2\n@@ -1,1 +1,1 @@\n-x\n+x\n\\ No newline at end"
+    )
+
+
+def test_long_lines_are_windowed():
+    undertest = str(
+        TextDiff.of("a" * 1000 + "b" + "a" * 1000, "a" * 1000 + "c" + "a" * 1000)
+    )
+    assert undertest.startswith("first difference at line 1, column 1001\n")
+    assert "expected: …'" + "a" * 80 + "b" in undertest
+    assert "  actual: …'" + "a" * 80 + "c" in undertest
+    assert "… (2001 characters)" in undertest
+    assert max(len(line) for line in undertest.splitlines()) < 200
+
+
+def test_same_edits_as_a_reference():
+    rng = random.Random(0)
+    for _ in range(200):
+        expected = [rng.choice("abcd") for _ in range(rng.randrange(12))]
+        actual = [rng.choice("abcd") for _ in range(rng.randrange(12))]
+        diff = TextDiff.of(
+            "".join(line + "\n" for line in expected),
+            "".join(line + "\n" for line in actual),
+            context=100,
+            max_lines=1000,
+        )
+        if expected == actual:
+            assert not diff
+            continue
+        # with this much context there is a single hunk, which holds both sides in full
+        body = str(diff).splitlines()[2:]
+        assert [line[1:] for line in body if line[0] != "+"] == expected
+        assert [line[1:] for line in body if line[0] != "-"] == actual
+
+
+def test_common_prefix_and_suffix():
+    rng = random.Random(1)
+    for _ in range(100):
+        common = bytes(rng.randrange(2) for _ in range(rng.randrange(20_000)))
+        a = common + bytes([2]) + common
+        b = common + bytes([3]) + common
+        assert _common_prefix_length(a, b) == len(common)
+        assert _common_suffix_length(a, b, len(a)) == len(common)
+        assert _common_prefix_length(common, common + b"x") == len(common)
+        assert _common_suffix_length(a, b, 5) == min(5, len(common))
+
+
+def test_huge_snapshots_are_within_budget():
+    lines = "".join(f"line {i} {'x' * 40}\n" for i in range(400_000))
+    x40 = "x" * 40
+
+    undertest = str(TextDiff.of(lines, lines.replace("line 200000 ", "line 200000!")))
+    assert undertest == "\n".join(
+        [
+            "first difference at line 200001, column 12",
+            "@@ -199998,7 +199998,7 @@",
+            f" line 199997 {x40}",
+            f" line 199998 {x40}",
+            f" line 199999 {x40}",
+            f"-line 200000 {x40}",
+            f"+line 200000!{x40}",
+            f" line 200001 {x40}",
+            f" line 200002 {x40}",
+            f" line 200003 {x40}",
+        ]
+    )
+
+    # too many edits for Myers, so the start of both sides is shown instead
+    undertest = str(TextDiff.of(lines, lines[::-1])).splitlines()
+    assert len(undertest) == 61
+    assert undertest[:3] == [
+        "first difference at line 1, column 1",
+        "@@ -1,30 +1,30 @@",
+        f"-line 0 {x40}",
+    ]
+    assert undertest[31] == f"-line 29 {x40}"
+    assert undertest[32] == "+"
+    assert undertest[33] == f"+{x40} 999993 enil"
+    assert undertest[-1] == "... (diff truncated)"
+
+    one_line = "y" * 20_000_000
+    undertest = str(
+        TextDiff.of(one_line, one_line[:10_000_000] + "z" + one_line[10_000_001:])
+    ).splitlines()
+    assert undertest[0] == "first difference at line 1, column 10000001"
+    assert undertest[1] == f"expected: …'{'y' * 160}'…"
+    assert undertest[2] == f"  actual: …'{'y' * 80}z{'y' * 79}'…"
+    assert undertest[3:] == [
+        "@@ -1,1 +1,1 @@",
+        f"-{'y' * 160}… (20000000 characters)",
+        "\\ No newline at end",
+        f"+{'y' * 160}… (20000000 characters)",
+        "\\ No newline at end",
+    ]
+
+
+def test_edit_budget(monkeypatch):
+    monkeypatch.setattr(text_diff, "_MAX_EDITS", 2)
+    assert str(TextDiff.of("a\nb\nc\n", "a\nB\nc\n")) == (
+        "first difference at line 2, column 1\n@@ -1,3 +1,3 @@\n a\n-b\n+B\n c"
+    )
+    assert str(TextDiff.of("a\nb\nc\n", "a\nB\nC\n")) == (
+        "first difference at line 2, column 1\n@@ -1,3 +1,3 @@\n a\n-b\n-c\n+B\n+C"
+    )
+
+
+def test_snapshot_mismatch_has_a_diff_per_facet():
+    lines = "".join(f"line {i}\n" for i in range(400_000))
+    expected = (
+        Snapshot.of(lines)
+        .plus_facet("md", lines)
+        .plus_facet("png", b"png")
+        .plus_facet("txt", "text")
+    )
+    actual = (
+        Snapshot.of(lines.replace("line 5\n", "line five\n"))
+        .plus_facet("md", lines.replace("line 300000\n", ""))
+        .plus_facet("png", b"jpg!")
+        .plus_facet("txt", b"binary")
+    )
+    undertest = Mode.readonly.msg_snapshot_mismatch_facets(
+        expected, actual, ["", "md", "png", "txt"]
+    )
+    assert undertest == (
+        "Snapshot mismatch\n"
+        "subject\n"
+        "first difference at line 6, column 6\n"
+        "@@ -3,7 +3,7 @@\n"
+        " line 2\n"
+        " line 3\n"
+        " line 4\n"
+        "-line 5\n"
+        "+line five\n"
+        " line 6\n"
+        " line 7\n"
+        " line 8\n"
+        "facet `md`\n"
+        "first difference at line 300001, column 11\n"
+        "@@ -299998,7 +299998,6 @@\n"
+        " line 299997\n"
+        " line 299998\n"
+        " line 299999\n"
+        "-line 300000\n"
+        " line 300001\n"
+        " line 300002\n"
+        " line 300003\n"
+        "facet `png`\n"
+        "first difference at offset 0 (0x0)\n"
+        "expected: 3 bytes, blake2b 3449a8e147e9b8b4dede218577f3fe88\n"
+        "  actual: 4 bytes, blake2b 5f7de04a56f5f7cfcf46af9fe0690fd1\n"
+        "-00000000  70 6e 67                                         |png|\n"
+        "+00000000  6a 70 67 21                                      |jpg!|\n"
+        "facet `txt`\n"
+        "expected 4 characters of text, actual 6 bytes of binary"
+    )
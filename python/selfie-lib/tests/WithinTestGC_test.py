@@ -0,0 +1,90 @@
+import pytest
+
+from selfie_lib import ArrayMap, ArraySet, PersistentSortedMap, Snapshot, WithinTestGC
+
+
+def gc_keeping(*suffixes: str) -> WithinTestGC:
+    gc = WithinTestGC()
+    for suffix in suffixes:
+        gc.keep_suffix(suffix)
+    return gc
+
+
+@pytest.mark.parametrize("map_type", [ArrayMap, PersistentSortedMap])
+def test_find_stale_snapshots_within(map_type):
+    keys = [
+        "orphan",
+        "test_a",
+        "test_a/kept",
+        "test_a/stale",
+        "test_a_b",
+        "test_a_b/x",
+        "test_all",
+        "test_all/x",
+        "test_didnt_run/x",
+        "zzz/x",
+    ]
+    snapshots = map_type.of((key, Snapshot.of(key)) for key in keys)
+    assert list(snapshots.keys()) == keys
+    tests_that_ran = map_type.of(
+        [
+            ("test_a", gc_keeping("/kept")),
+            ("test_a_b", gc_keeping("")),
+            ("test_all", WithinTestGC().keep_all()),
+            ("test_no_snapshots", gc_keeping()),
+        ]
+    )
+    stale = WithinTestGC.find_stale_snapshots_within(
+        snapshots, tests_that_ran, ["test_didnt_run"]
+    )
+    assert [keys[i] for i in stale] == [
+        "orphan",
+        "test_a",
+        "test_a/stale",
+        "test_a_b/x",
+        "zzz/x",
+    ]
+
+
+def test_nothing_is_stale_without_snapshots():
+    assert (
+        WithinTestGC.find_stale_snapshots_within(
+            ArrayMap.empty(), ArrayMap.empty().plus("test", gc_keeping()), []
+        )
+        == []
+    )
+
+
+def test_suffixes_are_sorted_once_the_test_finishes():
+    gc = WithinTestGC()
+    assert gc.succeeded_and_used_no_snapshots()
+    for i in reversed(range(1000)):
+        gc.keep_suffix(f"/{i}")
+        gc.keep_suffix(f"/{i}")
+    assert gc.keeps("/500")
+    assert not gc.keeps("/1000")
+    assert not gc.keeps_all()
+    assert not gc.succeeded_and_used_no_snapshots()
+    gc.finish()
+    assert gc.suffixes_to_keep == ArraySet.of(f"/{i}" for i in range(1000))
+    assert gc.keeps("/500")
+    assert not gc.keeps("/1000")
+
+    gc.keep_suffix("/1000")
+    assert gc.keeps("/1000")
+    assert gc.suffixes_to_keep is not None
+    assert len(gc.suffixes_to_keep) == 1001
+    assert not gc.keeps("")
+
+
+def test_keep_all():
+    gc = WithinTestGC()
+    gc.keep_suffix("/a")
+    gc.keep_all()
+    gc.keep_suffix("/b")
+    gc.finish()
+    assert gc.suffixes_to_keep is None
+    assert gc.keeps("/c")
+    assert gc.keeps_all()
+    assert not gc.succeeded_and_used_no_snapshots()
+    assert str(gc) == "(null)"